@@ -0,0 +1,101 @@
+"""
+Benchmark: fresh connection per request vs. pooled keep-alive client
+
+Starts a local OpenAI-style endpoint, sends the same chat payload N times
+with module-level ``httpx.post`` (what ``requests.post`` did before) and
+with ``HTTPClientPool``, and reports latency plus how many TCP
+connections the server had to accept.
+
+Usage:
+    python benchmarks/bench_http_pool.py [--requests 200] [--threads 4]
+"""
+import argparse
+import json
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import httpx  # noqa: E402
+
+from benchmarks.stats import nearest_rank  # noqa: E402
+from src.models.http_pool import HTTPClientPool  # noqa: E402
+
+REPLY = json.dumps({
+    "choices": [{"message": {"role": "assistant", "content": "pong"}}]
+}).encode("utf-8")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with _Handler.lock:
+            _Handler.connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(REPLY)))
+        self.end_headers()
+        self.wfile.write(REPLY)
+
+    def log_message(self, *args):
+        pass
+
+
+def _run(label, send, n, threads):
+    _Handler.connections = 0
+    payload = {"model": "bench", "messages": [{"role": "user", "content": "ping"}]}
+    timings = []
+
+    def one(_):
+        start = time.perf_counter()
+        send(payload)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    wall = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(one, range(n)))
+    wall = time.perf_counter() - wall
+
+    timings.sort()
+    print(
+        f"{label:<12} requests={n:<5} connections={_Handler.connections:<5} "
+        f"mean={statistics.mean(timings):.2f}ms "
+        f"p99={nearest_rank(timings, 99):.2f}ms "
+        f"throughput={n / wall:.0f} req/s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/v1/chat/completions"
+
+    _run("fresh", lambda p: httpx.post(url, json=p), args.requests, args.threads)
+
+    pool = HTTPClientPool(pool_size=args.threads, keepalive_connections=args.threads)
+    _run("pooled", lambda p: pool.send("bench", "POST", url, json=p), args.requests, args.threads)
+    pool.close()
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
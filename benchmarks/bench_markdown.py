@@ -0,0 +1,133 @@
+"""
+Benchmark: markdown + syntax highlighting of typical tutor answers
+
+Compares the per-call pipeline the chat renderer used to run (new
+``Markdown`` per message, ``get_lexer_by_name`` / new ``HtmlFormatter`` per
+block, ``guess_lexer`` for unknown fences) with the shared
+``MarkdownEngine``.
+
+Usage:
+    python benchmarks/bench_markdown.py [--rounds 50]
+"""
+import argparse
+import html
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import markdown  # noqa: E402
+from pygments import highlight  # noqa: E402
+from pygments.formatters import HtmlFormatter  # noqa: E402
+from pygments.lexers import get_lexer_by_name, guess_lexer  # noqa: E402
+
+from ui.components.markdown_engine import MarkdownEngine  # noqa: E402
+
+LONG_CODE = "\n".join(
+    f"def step_{i}(values):\n    total = sum(v * {i} for v in values)\n    return total / len(values)\n"
+    for i in range(60)
+)
+
+ANSWERS = {
+    "prose": """## Newton's second law
+
+The net force on a body equals its mass times its acceleration:
+**F = m·a**. Doubling the force doubles the acceleration, while doubling
+the mass halves it.
+
+- Force is measured in newtons (N)
+- Mass in kilograms (kg)
+- Acceleration in m/s²
+
+| Quantity | Symbol | Unit |
+|---|---|---|
+| Force | F | N |
+| Mass | m | kg |
+""",
+    "python": """Here is a binary search:
+
+```python
+def binary_search(items, target):
+    lo, hi = 0, len(items) - 1
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        if items[mid] == target:
+            return mid
+        if items[mid] < target:
+            lo = mid + 1
+        else:
+            hi = mid - 1
+    return -1
+```
+
+It runs in **O(log n)**.
+""",
+    "unknown-fence": """Pseudo-code first, then SQL:
+
+```pseudo
+for each row in table
+    if row.score > 90 then print row.name
+```
+
+```
+SELECT name FROM students WHERE score > 90;
+```
+""",
+    "long-python": f"A long listing:\n\n```python\n{LONG_CODE}```\n",
+    # guess_lexer settles on a near-plain lexer here, so legacy does less
+    # highlighting work than the engine (which detects Python)
+    "long-unknown": f"A long listing:\n\n```algo\n{LONG_CODE}```\n",
+}
+
+
+def legacy_render(text):
+    """The renderer's previous per-call pipeline"""
+
+    def highlight_code(match):
+        code = match.group(2)
+        lang = match.group(1) if match.group(1) else 'python'
+
+        try:
+            lexer = get_lexer_by_name(lang, stripall=True)
+        except Exception:
+            try:
+                lexer = guess_lexer(code)
+            except Exception:
+                return f'<pre><code>{html.escape(code)}</code></pre>'
+
+        formatter = HtmlFormatter(style='monokai', noclasses=True, cssclass='highlight')
+        highlighted = highlight(code, lexer, formatter)
+        return f'<div class="code-block-wrapper">{highlighted}</div>'
+
+    text = re.sub(r'```([\w+-]*)\n([\s\S]*?)```', highlight_code, text, flags=re.DOTALL)
+    return markdown.markdown(text, extensions=['extra', 'codehilite'])
+
+
+def _time(fn, text, rounds):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn(text)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.mean(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    engine = MarkdownEngine()
+    for name, text in ANSWERS.items():
+        legacy_render(text)  # warm imports / pygments plugin scan
+        engine.render(text)
+        before = _time(legacy_render, text, args.rounds)
+        after = _time(engine.render, text, args.rounds)
+        print(f"{name:<14} legacy={before:8.2f}ms engine={after:7.2f}ms speedup={before / after:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
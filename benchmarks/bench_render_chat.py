@@ -0,0 +1,109 @@
+"""
+Benchmark: chat render time per rerun vs. conversation length
+
+For each conversation size, times a cold render (empty render cache, as
+before per-message caching) and a warm rerun that adds one new exchange,
+which is what a Streamlit rerun after sending a message does. Warm time
+should stay roughly flat as the conversation grows.
+
+Also reports the size of ``chat_html`` for the same code-heavy
+conversation with inline-styled vs. class-based syntax highlighting (the
+shared stylesheet is sent separately and counted once).
+
+Usage:
+    python benchmarks/bench_render_chat.py [--sizes 10 100 1000] [--reruns 5]
+"""
+import argparse
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from ui.components import chat_interface, markdown_engine  # noqa: E402
+from ui.components.chat_interface import build_chat_html, chat_stylesheet  # noqa: E402
+from ui.components.markdown_engine import MarkdownEngine  # noqa: E402
+
+QUESTION = "How do I reverse a linked list in Python? Please explain step by step."
+
+ANSWER = """### Reversing a singly linked list
+
+Walk the list once and flip each `next` pointer:
+
+1. Keep a `prev` pointer, starting at `None`
+2. For each node, remember `node.next`, point it back at `prev`
+3. Move `prev` and `node` one step forward
+
+```python
+def reverse(head):
+    prev = None
+    node = head
+    while node:
+        nxt = node.next
+        node.next = prev
+        prev, node = node, nxt
+    return prev
+```
+
+This runs in **O(n)** time and **O(1)** extra space.
+"""
+
+
+def _exchange(i):
+    return [
+        {"id": uuid.uuid4().hex, "role": "user", "content": f"{QUESTION} ({i})",
+         "timestamp": "2025-01-01T10:00:00"},
+        {"id": uuid.uuid4().hex, "role": "assistant", "content": f"{ANSWER}\n({i})",
+         "model": "llama-3.1-8b-instant", "timestamp": "2025-01-01T10:00:05"},
+    ]
+
+
+def _html_bytes(messages, engine):
+    markdown_engine._engine = engine
+    chat_interface._render_cache.clear()
+    return len(build_chat_html(messages).encode("utf-8"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--reruns", type=int, default=5)
+    args = parser.parse_args()
+
+    chat_interface.RENDER_CACHE_MAX_ENTRIES = 2 * max(args.sizes) + 2 * args.reruns + 16
+
+    for size in args.sizes:
+        messages = [m for i in range(size // 2) for m in _exchange(i)]
+
+        chat_interface._render_cache.clear()
+        start = time.perf_counter()
+        build_chat_html(messages)
+        cold_ms = (time.perf_counter() - start) * 1000
+
+        warm_ms = []
+        for r in range(args.reruns):
+            messages.extend(_exchange(size + r))
+            start = time.perf_counter()
+            build_chat_html(messages)
+            warm_ms.append((time.perf_counter() - start) * 1000)
+
+        print(
+            f"messages={size:<5} cold={cold_ms:8.1f}ms "
+            f"rerun mean={statistics.mean(warm_ms):6.2f}ms max={max(warm_ms):6.2f}ms"
+        )
+
+    messages = [m for i in range(max(args.sizes) // 2) for m in _exchange(i)]
+    inline = _html_bytes(messages, MarkdownEngine(inline_styles=True))
+    classes = _html_bytes(messages, MarkdownEngine())
+    stylesheet = len(chat_stylesheet().encode("utf-8"))
+    print(
+        f"chat_html for {len(messages)} messages: inline styles={inline / 1024:.0f}KB "
+        f"classes={classes / 1024:.0f}KB (-{100 * (1 - classes / inline):.0f}%), "
+        f"stylesheet={stylesheet / 1024:.1f}KB once per page"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark: chat sanitizers on ordinary and adversarial input
+
+Runs ``sanitize_content``, ``sanitize_for_render`` and ``strip_all_html``
+on a typical AI reply and on inputs built to make backtracking regexes
+rescan the string (unclosed ``<script`` / ``<`` repeated, long whitespace
+runs, unterminated attributes). Each case is ``--kb`` kilobytes; the time
+per call should grow linearly with the size, so 100 KB of anything stays
+in the milliseconds.
+
+``--legacy`` also times the regex cascade the sanitizers replaced, which
+is quadratic on the adversarial cases (keep ``--kb`` small with it).
+
+Usage:
+    python benchmarks/bench_sanitizer.py [--kb 100] [--rounds 5] [--legacy]
+"""
+import argparse
+import html
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.utils.sanitizer import sanitize_content, sanitize_for_render, strip_all_html  # noqa: E402
+
+REPLY = (
+    "## Solving quadratics\n\nUse the formula `x = (-b ± √(b² - 4ac)) / 2a`.\n\n"
+    "```python\ndef roots(a, b, c):\n    d = (b * b - 4 * a * c) ** 0.5\n    return (-b + d) / (2 * a), (-b - d) / (2 * a)\n```\n\n"
+    "For **x² + 3x - 4 = 0**: a = 1, b = 3, c = -4, so x = 1 or x = -4.\n\n\n\n"
+)
+
+
+def _repeat(unit: str, size: int) -> str:
+    return (unit * (size // len(unit) + 1))[:size]
+
+
+def cases(size: int) -> dict:
+    return {
+        "ai-reply": _repeat(REPLY, size),
+        "unclosed-script": _repeat("<script ", size),
+        "script-no-gt": "<script" + _repeat(" a", size),
+        "lt-no-gt": _repeat("<", size),
+        "escaped-openers": _repeat("&lt;script&lt;style", size),
+        "whitespace": "x" + _repeat(" \t", size) + "x",
+        "newlines": "x" + _repeat("\n ", size) + "x",
+        "attr-unterminated": _repeat(' class="', size),
+        "nested-tags": _repeat("<style><iframe><script>", size),
+    }
+
+
+# --------------------------------------------------
+# The regex cascade the sanitizers replaced (for --legacy)
+# --------------------------------------------------
+def legacy_sanitize_content(text):
+    text = re.sub(r'<script[^>]*>.*?</script>', '', text, flags=re.DOTALL | re.IGNORECASE)
+    for tag in ['script', 'iframe', 'object', 'embed', 'style']:
+        text = re.sub(f'<{tag}[^>]*>.*?</{tag}>', '', text, flags=re.DOTALL | re.IGNORECASE)
+        text = re.sub(f'<{tag}[^>]*>', '', text, flags=re.IGNORECASE)
+    text = re.sub(r'\s+(class|style)\s*=\s*["\'][^"\']*["\']', '', text)
+    for cls in ['bubble', 'message', 'timestamp', 'meta', 'wrapper']:
+        text = re.sub(f'class=["\'][^"\']*{cls}[^"\']*["\']', '', text, flags=re.IGNORECASE)
+    text = re.sub(r'\n\s*\n\s*\n+', '\n\n', text)
+    text = re.sub(r' +', ' ', text)
+    return text.strip()
+
+
+def legacy_sanitize_for_render(text):
+    for tag in ["script", "style", "iframe"]:
+        text = re.sub(rf"<{tag}[\s\S]*?>[\s\S]*?</{tag}>", "", text, flags=re.IGNORECASE | re.DOTALL)
+    for tag in ["script", "style", "iframe"]:
+        text = re.sub(rf"&lt;{tag}", "", text, flags=re.IGNORECASE)
+    return re.sub(r'\n\s*\n\s*\n+', '\n\n', text).strip()
+
+
+def legacy_strip_all_html(text):
+    text = re.sub(r"<[^>]*>", "", text)
+    text = html.unescape(text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _time(fn, text, rounds):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--kb", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--legacy", action="store_true", help="also time the old regex cascade")
+    args = parser.parse_args()
+
+    sanitizers = [
+        ("content", sanitize_content, legacy_sanitize_content),
+        ("render", sanitize_for_render, legacy_sanitize_for_render),
+        ("strip", strip_all_html, legacy_strip_all_html),
+    ]
+    print(f"size={args.kb}KB rounds={args.rounds} (best of, ms per call)")
+    for name, text in cases(args.kb * 1024).items():
+        row = [f"{name:<18}"]
+        for label, fn, legacy in sanitizers:
+            row.append(f"{label}={_time(fn, text, args.rounds):7.2f}")
+            if args.legacy:
+                row.append(f"(legacy {_time(legacy, text, args.rounds):9.2f})")
+        print(" ".join(row))
+
+
+if __name__ == "__main__":
+    main()
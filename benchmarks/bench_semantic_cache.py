@@ -0,0 +1,81 @@
+"""
+Benchmark: semantic cache lookup latency vs. index size
+
+Fills a SemanticIndex with random unit vectors (10k, 100k, 1M entries by
+default), then times embedding + search for a batch of real-looking
+questions. Memory is the size of the vector matrix.
+
+Usage:
+    python benchmarks/bench_semantic_cache.py [--sizes 10000 100000 1000000] [--queries 200]
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np  # noqa: E402
+
+from benchmarks.stats import nearest_rank  # noqa: E402
+from src.models.semantic_cache import HashedNgramEmbedder, SemanticIndex  # noqa: E402
+
+QUESTIONS = [
+    "what is a derivative",
+    "explain the chain rule with an example",
+    "how do I balance a redox equation",
+    "what is the difference between mitosis and meiosis",
+    "solve x^2 - 5x + 6 = 0",
+    "why is the sky blue",
+]
+
+
+def _fill(index, size, dim, batch=100_000):
+    rng = np.random.default_rng(0)
+    for start in range(0, size, batch):
+        n = min(batch, size - start)
+        vectors = rng.standard_normal((n, dim), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        index.add_many(vectors, [((), (), "cached reply")] * n)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=256)
+    args = parser.parse_args()
+
+    embedder = HashedNgramEmbedder(dim=args.dim)
+    queries = [QUESTIONS[i % len(QUESTIONS)] for i in range(args.queries)]
+
+    embed_ms = []
+    for q in queries:
+        start = time.perf_counter()
+        embedder.embed(q)
+        embed_ms.append((time.perf_counter() - start) * 1000)
+    print(f"embed      mean={statistics.mean(embed_ms):.3f}ms")
+
+    for size in args.sizes:
+        index = SemanticIndex(args.dim, size)
+        _fill(index, size, args.dim)
+
+        vectors = [embedder.embed(q) for q in queries]
+        search_ms = []
+        for vector in vectors:
+            start = time.perf_counter()
+            index.search(vector)
+            search_ms.append((time.perf_counter() - start) * 1000)
+
+        search_ms.sort()
+        print(
+            f"entries={size:<9} memory={index.nbytes / 2**20:.0f}MB "
+            f"search mean={statistics.mean(search_ms):.3f}ms "
+            f"p99={nearest_rank(search_ms, 99):.3f}ms"
+        )
+        del index
+
+
+if __name__ == "__main__":
+    main()
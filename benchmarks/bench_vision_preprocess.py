@@ -0,0 +1,156 @@
+"""
+Benchmark: vision request size and latency, raw upload vs. preprocessed
+
+Builds typical homework images (a 12 MP phone photo with EXIF, a large
+PNG screenshot, a small PNG diagram), and for each one sends the hf-vision
+payload to a local OpenAI-style endpoint that reads the body at a
+simulated uplink speed. Reports request bytes, preprocessing time and
+end-to-end latency for the raw base64 (what was sent before) and the
+preprocessed image.
+
+Usage:
+    python benchmarks/bench_vision_preprocess.py [--uplink-mbps 10] [--rounds 3]
+"""
+import argparse
+import base64
+import io
+import json
+import random
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import httpx  # noqa: E402
+from PIL import Image, ImageDraw  # noqa: E402
+
+from src.models.vision_preprocess import prepare_image  # noqa: E402
+
+REPLY = json.dumps({
+    "choices": [{"message": {"role": "assistant", "content": "ok"}}]
+}).encode("utf-8")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    bytes_per_second = 10 * 1024 * 1024 / 8
+
+    def do_POST(self):
+        remaining = int(self.headers.get("Content-Length", 0))
+        chunk = 64 * 1024
+        while remaining:
+            n = min(chunk, remaining)
+            self.rfile.read(n)
+            remaining -= n
+            time.sleep(n / self.bytes_per_second)  # simulated uplink
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(REPLY)))
+        self.end_headers()
+        self.wfile.write(REPLY)
+
+    def log_message(self, *args):
+        pass
+
+
+def _photo():
+    """Noisy 4032x3024 JPEG with EXIF, like a phone shot of a worksheet"""
+    rng = random.Random(0)
+    img = Image.effect_noise((4032, 3024), 40).convert("RGB")
+    draw = ImageDraw.Draw(img)
+    for _ in range(200):
+        x, y = rng.randrange(4032), rng.randrange(3024)
+        draw.text((x, y), "x^2 + 3x - 4 = 0", fill=(20, 20, 20))
+    exif = Image.Exif()
+    exif[0x0112] = 6  # orientation: rotate 90
+    exif[0x010F] = "PhoneMaker"
+    buffer = io.BytesIO()
+    img.save(buffer, "JPEG", quality=95, exif=exif)
+    return buffer.getvalue()
+
+
+def _screenshot():
+    """2880x1800 RGBA PNG with text blocks"""
+    img = Image.new("RGBA", (2880, 1800), (250, 250, 250, 255))
+    draw = ImageDraw.Draw(img)
+    for row in range(0, 1800, 24):
+        draw.text((40, row), f"def solve_{row}(a, b): return (a + b) * {row}", fill=(30, 30, 120, 255))
+    buffer = io.BytesIO()
+    img.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def _diagram():
+    """Small palette PNG (already cheap to send)"""
+    img = Image.new("P", (600, 400), 0)
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((50, 50, 550, 350), outline=1)
+    draw.line((50, 350, 550, 50), fill=2)
+    buffer = io.BytesIO()
+    img.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def _payload(data_uri):
+    return {
+        "model": "bench-vision",
+        "messages": [{
+            "role": "user",
+            "content": [
+                {"type": "text", "text": "Solve the problem in this picture."},
+                {"type": "image_url", "image_url": {"url": data_uri}},
+            ],
+        }],
+        "max_tokens": 16,
+    }
+
+
+def _send(client, url, build, rounds):
+    timings, size, prep = [], 0, []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        data_uri = build()
+        prep.append((time.perf_counter() - start) * 1000)
+        body = json.dumps(_payload(data_uri)).encode("utf-8")
+        size = len(body)
+        client.post(url, content=body, headers={"Content-Type": "application/json"}).raise_for_status()
+        timings.append((time.perf_counter() - start) * 1000)
+    return size, statistics.mean(prep), statistics.mean(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--uplink-mbps", type=float, default=10.0)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    _Handler.bytes_per_second = args.uplink_mbps * 1024 * 1024 / 8
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/v1/chat/completions"
+
+    images = {"phone-photo": _photo(), "screenshot": _screenshot(), "diagram": _diagram()}
+    print(f"uplink={args.uplink_mbps} Mbit/s rounds={args.rounds}")
+
+    with httpx.Client(timeout=300) as client:
+        for name, data in images.items():
+            raw_b64 = base64.b64encode(data).decode("utf-8")
+            before = _send(client, url, lambda: f"data:image/jpeg;base64,{raw_b64}", args.rounds)
+            after = _send(client, url, lambda: prepare_image(data).data_uri(), args.rounds)
+            prepared = prepare_image(data)
+            print(
+                f"{name:<12} raw={before[0] / 1024:8.0f}KB e2e={before[2]:7.0f}ms | "
+                f"prepared={after[0] / 1024:6.0f}KB {prepared.width}x{prepared.height} {prepared.mime_type} "
+                f"prep={after[1]:5.0f}ms e2e={after[2]:6.0f}ms "
+                f"bytes {100 * (after[0] / before[0] - 1):+.0f}% speedup={before[2] / after[2]:.1f}x"
+            )
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
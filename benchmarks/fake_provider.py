@@ -0,0 +1,348 @@
+"""
+Fake OpenAI-compatible chat endpoint, for benchmarks and offline load tests
+
+Serves ``POST .../chat/completions`` the way Groq and the HF router do:
+plain JSON, or SSE with ``"stream": true``, including ``image_url``
+content parts. A profile sets how it behaves: latency before the response
+headers, time to first token, tokens per second, and the share of
+requests that fail with 503 or are rate limited with 429 + Retry-After.
+``GET /stats`` returns request counters.
+
+In a benchmark:
+
+    with FakeProvider(PROFILES["flaky"]) as url:
+        manager.groq_url = manager.hf_url = url
+
+Standalone, to run the whole app without network or API keys:
+
+    python benchmarks/fake_provider.py --profile realistic --port 8765
+    GROQ_API_URL=http://127.0.0.1:8765/v1/chat/completions \\
+    HF_API_URL=http://127.0.0.1:8765/v1/chat/completions \\
+    GROQ_API_KEY=fake HF_TOKEN=fake streamlit run ui/app.py
+"""
+import argparse
+import base64
+import binascii
+import json
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY = """### Solving x² + 3x - 4 = 0
+
+Factor it: <b>(x + 4)(x - 1) = 0</b>, so **x = -4** or **x = 1**.
+
+```python
+a, b, c = 1, 3, -4
+d = (b * b - 4 * a * c) ** 0.5
+print((-b + d) / (2 * a), (-b - d) / (2 * a))
+```
+"""
+
+# A "token" here is a word with its trailing whitespace
+TOKEN_RE = re.compile(r"\S+\s*|\s+")
+
+DATA_URI_RE = re.compile(r"data:image/[\w.+-]+;base64,(.*)", re.DOTALL)
+
+
+@dataclass
+class Profile:
+    latency_ms: float = 0.0        # before the response headers
+    jitter_ms: float = 0.0         # uniform, added to latency_ms
+    ttft_ms: float = 0.0           # headers to first token
+    tokens_per_sec: float = 0.0    # generation speed (0: instant)
+    error_rate: float = 0.0        # share of requests answered 503
+    rate_limit_rate: float = 0.0   # share of requests answered 429
+    retry_after: float = 1.0       # Retry-After on 429s, seconds
+    reply: str = REPLY
+
+
+PROFILES = {
+    "fast": Profile(latency_ms=5),
+    "slow": Profile(latency_ms=150, jitter_ms=50),
+    "flaky": Profile(latency_ms=20, error_rate=0.2),
+    # Roughly a hosted 8B model
+    "realistic": Profile(latency_ms=80, jitter_ms=40, ttft_ms=250, tokens_per_sec=120),
+    "throttled": Profile(latency_ms=20, rate_limit_rate=0.3, retry_after=1),
+}
+
+
+class BadRequest(Exception):
+    pass
+
+
+def count_images(payload: dict) -> int:
+    """Check a chat payload like the providers do; returns the number of images"""
+    messages = payload.get("messages")
+    if not payload.get("model"):
+        raise BadRequest("'model' is required")
+    if not isinstance(messages, list) or not messages:
+        raise BadRequest("'messages' must be a non-empty list")
+
+    images = 0
+    for message in messages:
+        if not isinstance(message, dict) or message.get("role") not in ("system", "user", "assistant"):
+            raise BadRequest(f"invalid message: {str(message)[:80]}")
+        content = message.get("content")
+        if isinstance(content, str):
+            continue
+        if not isinstance(content, list):
+            raise BadRequest("'content' must be a string or a list of parts")
+        for part in content:
+            kind = part.get("type") if isinstance(part, dict) else None
+            if kind == "text":
+                continue
+            if kind != "image_url":
+                raise BadRequest(f"unsupported content part: {kind}")
+            url = (part.get("image_url") or {}).get("url", "")
+            data = DATA_URI_RE.match(url)
+            if data:
+                try:
+                    base64.b64decode(data.group(1), validate=True)
+                except binascii.Error:
+                    raise BadRequest("image_url: invalid base64 data")
+            elif not url.startswith(("http://", "https://")):
+                raise BadRequest("image_url: expected a data:image/...;base64 URI or an http(s) URL")
+            images += 1
+    return images
+
+
+def _generation_time(tokens: int, profile: Profile) -> float:
+    return tokens / profile.tokens_per_sec if profile.tokens_per_sec > 0 else 0.0
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real providers
+    disable_nagle_algorithm = True  # headers and body are separate writes
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            self._send_json(200, self.server.provider.stats())
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+
+        provider = self.server.provider
+        with provider.track() as outcome:
+            if not self.headers.get("Authorization", "").startswith("Bearer "):
+                outcome["status"] = 401
+                self._send_json(401, {"error": {"message": "missing API key", "type": "invalid_request_error"}})
+                return
+            try:
+                payload = json.loads(body or b"{}")
+                outcome["images"] = count_images(payload)
+            except (ValueError, BadRequest) as e:
+                outcome["status"] = 400
+                self._send_json(400, {"error": {"message": str(e), "type": "invalid_request_error"}})
+                return
+
+            profile = provider.profile
+            delay, status = provider.draw()
+            time.sleep(delay)
+            outcome["status"] = status
+
+            if status == 429:
+                self._send_json(429, {"error": {
+                    "message": "Rate limit reached (injected)",
+                    "type": "requests",
+                    "code": "rate_limit_exceeded",
+                }}, headers={"Retry-After": f"{profile.retry_after:g}"})
+                return
+            if status == 503:
+                self._send_json(503, {"error": {"message": "injected failure", "type": "server_error"}})
+                return
+
+            tokens = TOKEN_RE.findall(profile.reply)
+            limit = payload.get("max_tokens")
+            finish = "stop"
+            if limit and len(tokens) > limit:
+                tokens, finish = tokens[:limit], "length"
+
+            if payload.get("stream"):
+                outcome["streamed"] = True
+                self._send_stream(payload["model"], tokens, finish, profile)
+                return
+
+            time.sleep(profile.ttft_ms / 1000 + _generation_time(len(tokens) - 1, profile))
+            prompt_tokens = len(body) // 4
+            self._send_json(200, {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": payload["model"],
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(tokens)},
+                    "finish_reason": finish,
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": len(tokens),
+                    "total_tokens": prompt_tokens + len(tokens),
+                },
+            })
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, model, tokens, finish, profile):
+        # Chunked, so the connection stays open for the next request
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def write(data: bytes):
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+        def event(delta, finish_reason=None):
+            chunk = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+
+        event({"role": "assistant"})
+        time.sleep(profile.ttft_ms / 1000)
+        step = _generation_time(1, profile)
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(step)
+            event({"content": token})
+        event({}, finish)
+        write(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeProvider:
+    def __init__(self, profile: Profile = None, seed: int = 0):
+        self.profile = profile or Profile()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._stats = {
+            "requests": 0,
+            "in_flight": 0,
+            "max_in_flight": 0,
+            "ok": 0,
+            "streamed": 0,
+            "images": 0,
+            "failed_503": 0,
+            "rate_limited_429": 0,
+            "rejected": 0,  # 400 / 401
+        }
+
+    def draw(self):
+        """(delay in seconds, status) for the next request"""
+        with self._lock:
+            jitter = self._rng.uniform(0, self.profile.jitter_ms)
+            roll = self._rng.random()
+        if roll < self.profile.rate_limit_rate:
+            status = 429
+        elif roll < self.profile.rate_limit_rate + self.profile.error_rate:
+            status = 503
+        else:
+            status = 200
+        return (self.profile.latency_ms + jitter) / 1000, status
+
+    @contextmanager
+    def track(self):
+        """Count a request; the handler fills in the yielded outcome"""
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["in_flight"] += 1
+            self._stats["max_in_flight"] = max(self._stats["max_in_flight"], self._stats["in_flight"])
+        outcome = {}
+        try:
+            yield outcome
+        finally:
+            counter = {200: "ok", 429: "rate_limited_429", 503: "failed_503"}.get(outcome.get("status"), "rejected")
+            with self._lock:
+                self._stats["in_flight"] -= 1
+                self._stats[counter] += 1
+                self._stats["images"] += outcome.get("images", 0)
+                self._stats["streamed"] += bool(outcome.get("streamed"))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start serving; returns the chat completions URL"""
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.provider = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://{host}:{self._server.server_port}/v1/chat/completions"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="realistic")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    # Override single fields of the profile
+    parser.add_argument("--latency-ms", type=float)
+    parser.add_argument("--jitter-ms", type=float)
+    parser.add_argument("--ttft-ms", type=float)
+    parser.add_argument("--tokens-per-sec", type=float)
+    parser.add_argument("--error-rate", type=float)
+    parser.add_argument("--rate-limit-rate", type=float)
+    parser.add_argument("--retry-after", type=float)
+    args = parser.parse_args()
+
+    fields = ("latency_ms", "jitter_ms", "ttft_ms", "tokens_per_sec", "error_rate", "rate_limit_rate", "retry_after")
+    overrides = {f: getattr(args, f) for f in fields if getattr(args, f) is not None}
+    profile = replace(PROFILES[args.profile], **overrides)
+
+    provider = FakeProvider(profile, seed=int(time.time()))
+    url = provider.start(args.host, args.port)
+    print(f"Fake provider ({args.profile}) on {url}")
+    print("  " + ", ".join(f"{f}={getattr(profile, f):g}" for f in fields))
+    print(f"Point the app at it:\n  GROQ_API_URL={url} HF_API_URL={url} GROQ_API_KEY=fake HF_TOKEN=fake")
+    print(f"Counters: GET http://{args.host}:{args.port}/stats (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        provider.stop()
+        print(json.dumps(provider.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
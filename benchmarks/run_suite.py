@@ -0,0 +1,292 @@
+"""
+Benchmark suite for the request path: sanitize -> route -> provider -> strip -> render
+
+Times ``AIManager.generate_response`` (and the streaming variant) against
+a local fake provider with latency and error profiles
+(``fake_provider.py``), plus ``sanitize_content``,
+``render_markdown_with_code`` and ``render_chat`` at several history
+sizes. Each benchmark runs once per parameter; results are printed and
+written as JSON (``--output``, by default ``benchmarks/results/``).
+
+``--compare`` checks the run against an earlier results file: any
+benchmark whose median got slower by more than ``--threshold`` is listed
+and the exit status is 1, so a regression can fail a CI job.
+
+Usage:
+    python benchmarks/run_suite.py [--filter render_chat] [--rounds 20]
+        [--output results.json] [--compare baseline.json] [--threshold 0.2]
+"""
+import argparse
+import base64
+import io
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+# Offline, deterministic provider calls: no caches (every call goes to the
+# fake server), no client-side quota, short retry backoff
+for name, value in {
+    "GROQ_API_KEY": "bench",
+    "HF_TOKEN": "bench",
+    "RESPONSE_CACHE_ENABLED": "false",
+    "SEMANTIC_CACHE_ENABLED": "false",
+    "RATE_LIMIT_ENABLED": "false",
+    "HEDGE_ENABLED": "false",
+    "CHAT_PERSISTENCE_ENABLED": "false",
+    "RETRY_BASE_DELAY": "0.05",
+    "RETRY_MAX_DELAY": "0.5",
+}.items():
+    os.environ.setdefault(name, value)
+
+from PIL import Image  # noqa: E402
+
+from benchmarks.fake_provider import PROFILES, FakeProvider  # noqa: E402
+from benchmarks.stats import nearest_rank  # noqa: E402
+from src.core.config import Config  # noqa: E402
+from src.models.ai_manager import AIManager  # noqa: E402
+from src.utils.sanitizer import sanitize_content  # noqa: E402
+from ui.components import chat_interface  # noqa: E402
+from ui.components.chat_interface import render_chat, render_markdown_with_code  # noqa: E402
+
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+
+# Per-request INFO logs and Streamlit's "bare mode" warnings would drown
+# the results (errors still show)
+logging.disable(logging.WARNING)
+
+# (name, params, setup); setup(param) returns the zero-argument callable
+# that is timed
+BENCHMARKS = []
+
+
+def benchmark(name, params):
+    def register(setup):
+        BENCHMARKS.append((name, params, setup))
+        return setup
+    return register
+
+
+# --------------------------------------------------
+# Fixtures
+# --------------------------------------------------
+QUESTION = "How do I solve x^2 + 3x - 4 = 0? Please explain step by step."
+
+ANSWERS = {
+    "prose": (
+        "## Newton's second law\n\nThe net force on a body equals its mass times its "
+        "acceleration: **F = m·a**. Doubling the force doubles the acceleration.\n\n"
+        "- Force in newtons\n- Mass in kilograms\n- Acceleration in m/s²\n"
+    ),
+    "code": "Here is the solution:\n\n```python\n" + "\n".join(
+        f"def step_{i}(values):\n    return sum(v * {i} for v in values) / len(values)\n" for i in range(20)
+    ) + "```\n",
+}
+ANSWERS["mixed"] = ANSWERS["prose"] + "\n" + ANSWERS["code"]
+
+_providers = {}
+
+
+def _provider_url(profile):
+    """One fake server per profile, shared by the benchmarks using it"""
+    if profile not in _providers:
+        provider = FakeProvider(PROFILES[profile])
+        _providers[profile] = (provider, provider.start())
+    return _providers[profile][1]
+
+
+def _manager(profile):
+    manager = AIManager()
+    manager.groq_url = manager.hf_url = _provider_url(profile)
+    return manager
+
+
+def _history(size):
+    messages = []
+    for i in range(size // 2):
+        messages.append({"id": uuid.uuid4().hex, "role": "user", "content": f"{QUESTION} ({i})",
+                         "timestamp": "2025-01-01T10:00:00"})
+        messages.append({"id": uuid.uuid4().hex, "role": "assistant", "content": f"{ANSWERS['mixed']}\n({i})",
+                         "model": "llama-3.1-8b-instant", "timestamp": "2025-01-01T10:00:05"})
+    return messages
+
+
+def _image_file():
+    buffer = io.BytesIO()
+    Image.new("RGB", (1600, 1200), (240, 240, 240)).save(buffer, "JPEG")
+    return {"name": "worksheet.jpg", "type": "image/jpeg",
+            "data": base64.b64encode(buffer.getvalue()).decode("utf-8")}
+
+
+# --------------------------------------------------
+# Benchmarks
+# --------------------------------------------------
+@benchmark("generate_response", [
+    "llama-3.1-8b-instant/fast",
+    "llama-3.1-8b-instant/slow",
+    "llama-3.1-8b-instant/flaky",
+    "phi-3-mini/fast",
+    "hf-vision/fast",
+])
+def bench_generate_response(param):
+    model, profile = param.split("/")
+    manager = _manager(profile)
+    history = _history(10)
+    files = [_image_file()] if model == "hf-vision" else None
+    return lambda: manager.generate_response(QUESTION, model, files=files, history=history)
+
+
+@benchmark("generate_response_stream", ["llama-3.1-8b-instant/fast", "llama-3.1-8b-instant/slow"])
+def bench_generate_response_stream(param):
+    model, profile = param.split("/")
+    manager = _manager(profile)
+    history = _history(10)
+    return lambda: "".join(manager.generate_response_stream(QUESTION, model, history=history))
+
+
+@benchmark("sanitize_content", ["1KB", "10KB", "100KB"])
+def bench_sanitize_content(param):
+    size = int(param[:-2]) * 1024
+    text = (ANSWERS["mixed"] * (size // len(ANSWERS["mixed"]) + 1))[:size]
+    return lambda: sanitize_content(text)
+
+
+@benchmark("render_markdown_with_code", list(ANSWERS))
+def bench_render_markdown(param):
+    text = ANSWERS[param]
+    return lambda: render_markdown_with_code(text)
+
+
+@benchmark("render_chat", [f"{mode}/{size}" for mode in ("cold", "warm") for size in (10, 100, 1000)])
+def bench_render_chat(param):
+    """
+    cold: nothing cached; warm: a rerun after one new message. Rendered
+    with the app's window, as ui/app.py does: time should level off
+    once the history is longer than CHAT_WINDOW_SIZE.
+    """
+    mode, size = param.split("/")
+    messages = _history(int(size))
+    chat_interface.RENDER_CACHE_MAX_ENTRIES = max(chat_interface.RENDER_CACHE_MAX_ENTRIES, 4 * len(messages))
+    chat_interface._render_cache.clear()
+
+    if mode == "cold":
+        def run():
+            chat_interface._render_cache.clear()
+            render_chat(messages, Config.CHAT_WINDOW_SIZE)
+    else:
+        render_chat(messages, Config.CHAT_WINDOW_SIZE)
+
+        def run():
+            messages.append(_history(2)[1])
+            render_chat(messages, Config.CHAT_WINDOW_SIZE)
+    return run
+
+
+# --------------------------------------------------
+# Runner
+# --------------------------------------------------
+def _time(fn, rounds):
+    fn()  # warm-up: imports, connections, caches of the code under test
+    timings, errors = [], 0
+    for _ in range(rounds):
+        start = time.perf_counter()
+        out = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+        if isinstance(out, str) and out.startswith("❌"):
+            errors += 1
+
+    timings.sort()
+    return {
+        "rounds": rounds,
+        "min_ms": round(timings[0], 3),
+        "median_ms": round(statistics.median(timings), 3),
+        "mean_ms": round(statistics.mean(timings), 3),
+        "p95_ms": round(nearest_rank(timings, 95), 3),
+        "stdev_ms": round(statistics.stdev(timings), 3) if len(timings) > 1 else 0.0,
+        "errors": errors,
+    }
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Names of the benchmarks whose median got slower than ``threshold``"""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before or not before.get("median_ms"):
+            continue
+        change = result["median_ms"] / before["median_ms"] - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  <-- regression"
+        print(f"{name:<48} {before['median_ms']:10.3f} -> {result['median_ms']:10.3f} ms {change:+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--filter", default="", help="only benchmarks whose name contains this")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--compare", type=Path, help="earlier results file to check against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    results = {}
+    for name, params, setup in BENCHMARKS:
+        if args.filter not in name:
+            continue
+        for param in params:
+            key = f"{name}[{param}]"
+            results[key] = _time(setup(param), args.rounds)
+            r = results[key]
+            print(
+                f"{key:<48} median={r['median_ms']:9.3f}ms p95={r['p95_ms']:9.3f}ms "
+                f"min={r['min_ms']:9.3f}ms" + (f" errors={r['errors']}" if r["errors"] else "")
+            )
+
+    for provider, _ in _providers.values():
+        provider.stop()
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    output = args.output or RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))["results"]
+        print(f"\nCompared with {args.compare} (threshold {args.threshold:.0%}):")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s)")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
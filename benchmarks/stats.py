@@ -0,0 +1,9 @@
+"""
+Summary statistics shared by the benchmarks
+"""
+import math
+
+
+def nearest_rank(ordered, p):
+    """p-th percentile (0 < p <= 100) of sorted values, nearest-rank method"""
+    return ordered[max(0, math.ceil(p * len(ordered) / 100) - 1)]
@@ -35,6 +35,11 @@ class Config:
     DATABASE_DIR = BASE_DIR / "database"
     LOGS_DIR = BASE_DIR / "logs"
     UPLOAD_DIR = BASE_DIR / "uploads"
+    # Served by Streamlit at app/static/... (server.enableStaticServing)
+    STATIC_DIR = BASE_DIR / "ui" / "static"
+    STATIC_ATTACHMENTS_DIR = STATIC_DIR / "attachments"
+    # Text extracted from uploads, by content hash
+    EXTRACTED_DIR = DATA_DIR / "extracted"
 
     # Database
     DATABASE_URL = os.getenv(
@@ -47,11 +52,42 @@ class Config:
         "TESSERACT_PATH",
         r"C:\Program Files\Tesseract-OCR\tesseract.exe"
     )
+    # Text models get OCR text of attached images (needs pytesseract)
+    OCR_ENABLED = os.getenv("OCR_ENABLED", "true").lower() == "true"
+    OCR_MIN_CONFIDENCE = float(os.getenv("OCR_MIN_CONFIDENCE", "50"))
 
     # File limits
     MAX_FILE_SIZE_MB = int(os.getenv("MAX_FILE_SIZE_MB", "10"))
     MAX_FILE_SIZE_BYTES = MAX_FILE_SIZE_MB * 1024 * 1024
 
+    # Attachment store: recently used uploads kept in memory
+    ATTACHMENT_CACHE_MB = int(os.getenv("ATTACHMENT_CACHE_MB", "64"))
+
+    # Vision model input: images are downsampled to at most this many pixels
+    # (Qwen2.5-VL reads 28x28 patches), stripped of EXIF and sent as JPEG
+    VISION_PREPROCESS_ENABLED = os.getenv("VISION_PREPROCESS_ENABLED", "true").lower() == "true"
+    VISION_MAX_PIXELS = int(os.getenv("VISION_MAX_PIXELS", str(1280 * 28 * 28)))
+    VISION_JPEG_QUALITY = int(os.getenv("VISION_JPEG_QUALITY", "85"))
+    VISION_PREPROCESS_WORKERS = int(os.getenv("VISION_PREPROCESS_WORKERS", "4"))
+
+    # Several images per question: packed into one request up to these
+    # limits, larger sets are split into parallel requests
+    VISION_BATCH_MAX_PIXELS = int(os.getenv("VISION_BATCH_MAX_PIXELS", str(4 * 1280 * 28 * 28)))
+    VISION_BATCH_MAX_IMAGES = int(os.getenv("VISION_BATCH_MAX_IMAGES", "4"))
+
+    # Documents (PDF / text) sent to the text models as prompt context
+    DOCUMENT_CONTEXT_TOKENS = int(os.getenv("DOCUMENT_CONTEXT_TOKENS", "3000"))
+    DOCUMENT_CHUNK_TOKENS = int(os.getenv("DOCUMENT_CHUNK_TOKENS", "400"))
+    PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "300"))
+    # PDFs with at least this many pages are split across worker processes
+    PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "40"))
+    PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+    # Chat image previews: longest side in px, one per screen density (1x, 2x)
+    THUMBNAIL_SIZES = tuple(int(s) for s in os.getenv("THUMBNAIL_SIZES", "320,640").split(","))
+    THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", "80"))
+    THUMBNAIL_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", "2"))
+
     # File extensions
     ALLOWED_EXTENSIONS = {
         "pdf": "application/pdf",
@@ -70,6 +106,78 @@ class Config:
     GROQ_API_KEY = os.getenv("GROQ_API_KEY")
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
+    # Provider endpoints (OpenAI-compatible chat completions); point both at
+    # benchmarks/fake_provider.py to run and load test the app offline
+    GROQ_API_URL = os.getenv("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions")
+    HF_API_URL = os.getenv("HF_API_URL", "https://router.huggingface.co/v1/chat/completions")
+
+    # Chat view: messages drawn per page ("Load earlier" adds another window;
+    # 0 draws the whole conversation)
+    CHAT_WINDOW_SIZE = int(os.getenv("CHAT_WINDOW_SIZE", "40"))
+
+    # Conversations are saved to DATABASE_URL and resumed from the ?c= URL
+    # parameter; a resumed chat loads one window and pages back on demand
+    CHAT_PERSISTENCE_ENABLED = os.getenv("CHAT_PERSISTENCE_ENABLED", "true").lower() == "true"
+    # Saved in the background: group commit every PERSIST_BATCH_SIZE messages
+    # or PERSIST_FLUSH_INTERVAL seconds
+    PERSIST_QUEUE_SIZE = int(os.getenv("PERSIST_QUEUE_SIZE", "1000"))
+    PERSIST_BATCH_SIZE = int(os.getenv("PERSIST_BATCH_SIZE", "64"))
+    PERSIST_FLUSH_INTERVAL = float(os.getenv("PERSIST_FLUSH_INTERVAL", "0.5"))
+
+    # Multi-turn history sent with each question (bounded by the model's
+    # context length as well; older turns are folded into a short summary)
+    HISTORY_MAX_TOKENS = int(os.getenv("HISTORY_MAX_TOKENS", "4000"))
+    HISTORY_SUMMARY_TOKENS = int(os.getenv("HISTORY_SUMMARY_TOKENS", "300"))
+
+    # HTTP connection pooling (shared by all provider calls)
+    HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))
+    HTTP_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_KEEPALIVE_CONNECTIONS", "10"))
+    HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+    HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "60"))
+    HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+
+    # Retries for 429/5xx and network errors
+    # (override per provider with GROQ_RETRY_* / HF_RETRY_*)
+    RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "4"))
+    RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "0.5"))
+    RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "8"))
+    RETRY_DEADLINE = float(os.getenv("RETRY_DEADLINE", "90"))
+
+    # Circuit breaker per provider (text models fail over to the other one)
+    BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "3"))
+    BREAKER_RECOVERY_TIMEOUT = float(os.getenv("BREAKER_RECOVERY_TIMEOUT", "30"))
+    BREAKER_HALF_OPEN_MAX_CALLS = int(os.getenv("BREAKER_HALF_OPEN_MAX_CALLS", "1"))
+
+    # Hedged text requests (opt-in): duplicate to the other backend when the
+    # primary is slower than its usual HEDGE_PERCENTILE time-to-first-byte
+    HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "false").lower() == "true"
+    HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+    HEDGE_DEFAULT_DELAY = float(os.getenv("HEDGE_DEFAULT_DELAY", "2.0"))  # until enough samples
+    HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.1"))
+    HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+
+    # Client-side rate limits per API key (0 disables that bucket)
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    GROQ_RPM = int(os.getenv("GROQ_RPM", "30"))
+    GROQ_TPM = int(os.getenv("GROQ_TPM", "6000"))
+    HF_RPM = int(os.getenv("HF_RPM", "60"))
+    HF_TPM = int(os.getenv("HF_TPM", "0"))
+    RATE_LIMIT_COMPLETION_TOKENS = int(os.getenv("RATE_LIMIT_COMPLETION_TOKENS", "512"))  # expected reply size
+    RATE_LIMIT_SHORT_PROMPT_TOKENS = int(os.getenv("RATE_LIMIT_SHORT_PROMPT_TOKENS", "200"))  # priority lane
+
+    # Response cache (only used at or below the max temperature)
+    RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+    RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")  # memory | sqlite
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+    RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "86400"))
+    RESPONSE_CACHE_MAX_TEMPERATURE = float(os.getenv("RESPONSE_CACHE_MAX_TEMPERATURE", "0.2"))
+
+    # Semantic (near-duplicate) cache, layered behind the response cache above
+    SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+    SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9"))
+    SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "10000"))  # per model
+    SEMANTIC_CACHE_DIM = int(os.getenv("SEMANTIC_CACHE_DIM", "256"))
+
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 
     @classmethod
@@ -78,6 +186,8 @@ class Config:
         cls.DATABASE_DIR.mkdir(parents=True, exist_ok=True)
         cls.LOGS_DIR.mkdir(parents=True, exist_ok=True)
         cls.UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+        cls.STATIC_ATTACHMENTS_DIR.mkdir(parents=True, exist_ok=True)
+        cls.EXTRACTED_DIR.mkdir(parents=True, exist_ok=True)
 
 
 Config.ensure_directories()
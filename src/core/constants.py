@@ -48,6 +48,24 @@ class UIConstants:
 class ModelConstants:
     """AI Model constants"""
     AVAILABLE_MODELS = {
+        "llama-3.1-8b-instant": {
+            "name": "LLaMA 3.1 8B Instant",
+            "description": "Groq-hosted, fastest text responses",
+            "context_length": 131072,
+            "icon": "🦙"
+        },
+        "phi-3-mini": {
+            "name": "Llama 3.1 8B (HuggingFace)",
+            "description": "HuggingFace Router via Cerebras",
+            "context_length": 8192,
+            "icon": "🤗"
+        },
+        "hf-vision": {
+            "name": "Qwen2.5-VL 7B",
+            "description": "Image and diagram understanding",
+            "context_length": 32768,
+            "icon": "🖼️"
+        },
         "llama3.2": {
             "name": "Llama 3.2",
             "description": "Fast and efficient for general queries",
@@ -69,6 +87,7 @@ class ModelConstants:
     }
     
     DEFAULT_MODEL = "llama3.2"
+    DEFAULT_CONTEXT_LENGTH = 4096  # for model keys not listed above
 
 class AcademicConstants:
     """Academic-related constants"""
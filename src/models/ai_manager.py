@@ -1,232 +1,763 @@
-import requests
-import re
 import base64
 import os
-import html
+import time
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import httpx
+from src.core.config import Config
+from src.models.circuit_breaker import CLOSED, breaker_for
+from src.models.context_window import build_history, history_budget
+from src.models.hedging import get_hedger
+from src.models.http_pool import get_http_pool
+from src.models.rate_limiter import estimate_prompt_tokens, get_scheduler
+from src.models.response_cache import get_response_cache, make_cache_key
+from src.models.retry import get_retry_policy, parse_retry_after
+from src.models.semantic_cache import get_semantic_cache
+from src.models.streaming import HTMLStripStream, iter_sse_deltas
+from src.models.vision_preprocess import pack_images, prepare_attachments
+from src.processors.pdf_processor import document_context
 from src.utils.logger import setup_logger
+from src.utils.sanitizer import strip_all_html
+
+
+FILES_NOTE = (
+    "⚠️ Note: This model cannot see uploaded files.\n"
+    "Only answering based on text:\n\n"
+)
+
+# Some files were read into the prompt, these weren't
+UNREAD_FILES_NOTE = "⚠️ Note: This model cannot see {names}.\n\n"
+
+# Worker threads for the two legs of hedged requests
+_HEDGE_POOL = ThreadPoolExecutor(max_workers=2 * Config.HTTP_POOL_SIZE, thread_name_prefix="hedge")
+
+# Worker threads for the parts of a split vision request
+_VISION_POOL = ThreadPoolExecutor(max_workers=Config.HTTP_POOL_SIZE, thread_name_prefix="vision-parts")
+
+
+def _close_losing_leg(future):
+    """Done-callback for a hedge leg that lost the race: drop its response"""
+    if future.cancelled() or future.exception() is not None:
+        return
+    res = future.result()[0]
+    if res is not None:
+        res.close()
 
 
 class AIManager:
-    def __init__(self):
+    # Only Groq-supported models go in this map
+    GROQ_MODEL_MAP = {
+        "llama-3.1-8b-instant": "llama-3.1-8b-instant",
+    }
+
+    # Format: model-name:provider is required for HF Router API
+    HF_TEXT_MODEL = "meta-llama/Llama-3.1-8B-Instruct:cerebras"
+    HF_VISION_MODEL = "Qwen/Qwen2.5-VL-7B-Instruct:hyperbolic"
+
+    # Text models that can stand in for each other when a provider is down
+    TEXT_FAILOVER = {
+        "llama-3.1-8b-instant": "phi-3-mini",
+        "phi-3-mini": "llama-3.1-8b-instant",
+    }
+
+    def __init__(self, hedging=None):
         self.logger = setup_logger()
 
         # API endpoints
-        self.groq_url = "https://api.groq.com/openai/v1/chat/completions"
-        self.hf_url = "https://router.huggingface.co/v1/chat/completions"
+        self.groq_url = Config.GROQ_API_URL
+        self.hf_url = Config.HF_API_URL
 
         # API keys
         self.groq_key = os.getenv("GROQ_API_KEY", "")
         self.hf_token = os.getenv("HF_TOKEN", "")  # Required for Router API
 
+        # Shared keep-alive connection pool (one client per provider)
+        self.http = get_http_pool()
+
+        # Process-wide response cache (None when disabled)
+        self.cache = get_response_cache()
+        self.semantic_cache = get_semantic_cache()
+
+        # Model key that actually answered the last request (after failover)
+        self.served_model = None
+
+        # Opt-in hedging of text requests across Groq / HF
+        self.hedging = Config.HEDGE_ENABLED if hedging is None else hedging
+        self.hedger = get_hedger()
+
     # ------------------------------------------------------
     # Ultra HTML Sanitizer
     # ------------------------------------------------------
     def _strip_all_html(self, text):
-        if not text:
-            return ""
+        return strip_all_html(text)
 
-        text = str(text)
+    def _strip_reply(self, request, reply):
+        """Split requests come back stripped part by part (headings keep their line breaks)"""
+        return reply if request.get("parts") else self._strip_all_html(reply)
 
-        # Remove HTML tags
-        text = re.sub(r"<[^>]*>", "", text)
+    # ------------------------------------------------------
+    # Response Cache
+    # ------------------------------------------------------
+    def _cache_key(self, question, model, temperature, max_tokens, files, context=None):
+        """Cache key for a request, or None if it shouldn't be cached"""
+        if self.cache is None or not self.cache.is_cacheable(temperature):
+            return None
+        return make_cache_key(model, question, temperature, max_tokens, files, context)
+
+    def _use_semantic_cache(self, key, files, context=None):
+        # Same temperature rule as the exact cache; attachments and earlier
+        # turns make the question text alone meaningless, so those requests
+        # are exact-match only
+        return key is not None and self.semantic_cache is not None and not files and not context
+
+    def _cache_lookup(self, key, question, model, files, context=None):
+        if key is None:
+            return None
+
+        reply = self.cache.get(key)
+        if reply is not None:
+            self.logger.info("⚡ Response cache hit")
+            return reply
+
+        if self._use_semantic_cache(key, files, context):
+            reply = self.semantic_cache.lookup(model, question)
+            if reply is not None:
+                self.logger.info("⚡ Semantic cache hit")
+        return reply
+
+    def _cache_store(self, key, question, model, files, reply, started, context=None):
+        # Never cache error / warning replies
+        if key is None or not reply or reply.startswith(("❌", "⚠️")):
+            return
+        self.cache.put(
+            key,
+            reply,
+            latency=time.perf_counter() - started,
+            tokens=(len(question) + len(reply)) // 4,
+        )
+        if self._use_semantic_cache(key, files, context):
+            self.semantic_cache.add(model, question, reply)
 
-        # Decode safe HTML entities
-        text = html.unescape(text)
+    # ------------------------------------------------------
+    # Conversation history
+    # ------------------------------------------------------
+    def _history_window(self, model, prompt, max_tokens, history):
+        """Earlier turns of ``history`` that fit ``model``'s context next to ``prompt``"""
+        if not history:
+            return []
+        budget = history_budget(model, prompt, max_tokens, Config.HISTORY_MAX_TOKENS)
+        return build_history(history, budget, Config.HISTORY_SUMMARY_TOKENS)
 
-        # Clean whitespace
-        text = re.sub(r"\s+", " ", text)
+    # ------------------------------------------------------
+    # Request Builders
+    # ------------------------------------------------------
+    def _headers(self, token):
+        return {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+
+    def _groq_request(self, prompt, model, temperature=0.7, max_tokens=2048, context=None):
+        payload = {
+            "model": model,
+            "messages": list(context or []) + [
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+        return {
+            "provider": "groq",
+            "label": "Groq",
+            "url": self.groq_url,
+            "headers": self._headers(self.groq_key),
+            "payload": payload,
+        }
+
+    def _hf_text_request(self, prompt, temperature=0.7, max_tokens=1024, context=None):
+        if not self.hf_token:
+            raise ValueError("HF_TOKEN missing in .env")
+
+        # Use Llama-3.1-8B-Instruct via Cerebras (fastest provider)
+        payload = {
+            "model": self.HF_TEXT_MODEL,
+            "messages": list(context or []) + [
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": max_tokens,
+            "temperature": temperature
+        }
+        return {
+            "provider": "hf",
+            "label": "HuggingFace Text",
+            "url": self.hf_url,
+            "headers": self._headers(self.hf_token),
+            "payload": payload,
+        }
+
+    def _hf_vision_request(self, prompt, images, temperature=0.7, max_tokens=1024, context=None):
+        """One vision request for ``images`` (``PreparedImage``s, sent in order)"""
+        if not self.hf_token:
+            raise ValueError("HF_TOKEN missing in .env")
+
+        payload = {
+            "model": self.HF_VISION_MODEL,
+            "messages": list(context or []) + [
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": prompt
+                        },
+                        *(
+                            {
+                                "type": "image_url",
+                                "image_url": {
+                                    # Downsampled, metadata-free and labelled with its real type
+                                    "url": image.data_uri()
+                                }
+                            }
+                            for image in images
+                        )
+                    ]
+                }
+            ],
+            "max_tokens": max_tokens,
+            "temperature": temperature
+        }
+        return {
+            "provider": "hf",
+            "label": "HuggingFace Vision",
+            "url": self.hf_url,
+            "headers": self._headers(self.hf_token),
+            "payload": payload,
+        }
+
+    def _vision_request(self, prompt, files, temperature=0.7, max_tokens=1024, context=None):
+        """
+        Vision request for all uploaded images. Images that fit the batch
+        budget share one request; larger sets become a request with
+        ``parts``, sent in parallel and answered per batch.
+        """
+        images = prepare_attachments(files)
+        batches = pack_images(images)
+        if len(batches) == 1:
+            return self._hf_vision_request(prompt, images, temperature, max_tokens, context)
+
+        parts, first = [], 1
+        for batch in batches:
+            last = first + len(batch) - 1
+            note = (
+                f"The student uploaded {len(images)} images; these are images "
+                f"{first}-{last}. Answer using what they show.\n\n"
+            )
+            part = self._hf_vision_request(note + prompt, batch, temperature, max_tokens, context)
+            part["images"] = (first, last, len(images))
+            parts.append(part)
+            first = last + 1
+
+        self.logger.info(f"🖼️ {len(images)} images split into {len(parts)} vision requests")
+        return {
+            "provider": "hf",
+            "label": "HuggingFace Vision",
+            "parts": parts,
+        }
 
-        return text.strip()
+    # ------------------------------------------------------
+    # Client-side rate limiting
+    # ------------------------------------------------------
+    def _tag_session(self, request, session_id):
+        """Attach the session (for fair scheduling) to a request and its fallback / parts"""
+        request["session_id"] = session_id
+        if request.get("fallback"):
+            request["fallback"]["session_id"] = session_id
+        for part in request.get("parts", []):
+            part["session_id"] = session_id
+
+    def _rate_limit_args(self, request):
+        """(session_id, tokens, prompt_tokens) to reserve with the provider's scheduler"""
+        payload = request["payload"]
+        prompt_tokens = estimate_prompt_tokens(payload)
+        completion = min(Config.RATE_LIMIT_COMPLETION_TOKENS, payload.get("max_tokens", Config.RATE_LIMIT_COMPLETION_TOKENS))
+        return request.get("session_id"), prompt_tokens + completion, prompt_tokens
+
+    def _rate_limited(self, scheduler, policy, retry_after):
+        """A 429 means the provider's budget is spent for everyone: pause the queue"""
+        if scheduler is not None:
+            pause = parse_retry_after(retry_after)
+            scheduler.pause(policy.base_delay if pause is None else pause)
 
     # ------------------------------------------------------
-    # Groq Text-only Models
+    # Transport: retries, blocking and streaming
     # ------------------------------------------------------
-    def _call_groq_text(self, prompt, model, temperature=0.7, max_tokens=2048):
+    def _send(self, request, stream=False):
+        """
+        POST a chat request through its provider's circuit breaker.
+
+        Text requests carry a ``fallback`` request for the other text
+        backend; it is used when the primary's breaker is open or the
+        primary fails with a provider-side error. The key of the backend
+        that answered is stored in ``request["served_by"]``.
+
+        Returns ``(response, None)`` on HTTP 200, or ``(None, error)``.
+        """
+        if (
+            self.hedging
+            and request.get("fallback")
+            and breaker_for(request).state == CLOSED
+        ):
+            return self._send_hedged(request, stream)
+
+        candidates = [request]
+        if request.get("fallback"):
+            candidates.append(request["fallback"])
+
+        error = None
+        for i, candidate in enumerate(candidates):
+            breaker = breaker_for(candidate)
+            is_last = i == len(candidates) - 1
+
+            if not breaker.allow_request():
+                error = f"❌ {candidate['label']} Error: temporarily unavailable (circuit open)"
+            else:
+                res, error, provider_failed = self._send_with_retries(candidate, stream)
+                if not provider_failed:
+                    breaker.record_success()
+                    if res is not None:
+                        request["served_by"] = candidate.get("model")
+                    return res, error
+                breaker.record_failure()
+
+            if not is_last:
+                self.logger.warning(
+                    f"↪️ {candidate['label']} unavailable, failing over to {candidates[i + 1]['label']}"
+                )
+
+        return None, error
+
+    def _send_hedged(self, request, stream=False):
+        """
+        Race the primary text backend against its fallback.
+
+        The fallback is sent only if the primary hasn't returned response
+        headers within the hedge delay (a percentile of its recent
+        time-to-first-byte), or straight away if the primary fails or its
+        breaker turns it away. The first leg with an HTTP 200 wins; the
+        loser stops retrying and its response is closed unread. Both legs
+        send the caller's ``stream`` flag but are opened unread, so callers
+        that want the whole body must ``read()`` it.
+        """
+        primary, secondary = request, request["fallback"]
+        cancel = threading.Event()
+
+        legs, error = {}, None
+        if breaker_for(primary).allow_request():
+            legs[_HEDGE_POOL.submit(self._send_with_retries, primary, stream, cancel, True)] = primary
+        else:
+            # Opened since _send checked it: fail over without a race
+            error = f"❌ {primary['label']} Error: temporarily unavailable (circuit open)"
+        pending = set(legs)
+        timeout = self.hedger.delay_for(primary["provider"])
+        hedged = secondary_sent = False
+
+        while pending or not secondary_sent:
+            if pending:
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            else:
+                done = set()
+            timeout = None
+
+            for future in done:
+                res, error, provider_failed = future.result()
+                leg = legs[future]
+                breaker = breaker_for(leg)
+                if provider_failed:
+                    breaker.record_failure()
+                    continue
+                breaker.record_success()
+
+                # Winner, or a rejected request (e.g. 400) the other leg won't fix
+                cancel.set()
+                for loser in done - {future}:  # finished in the same wait()
+                    _close_losing_leg(loser)
+                for loser in pending:
+                    loser.add_done_callback(_close_losing_leg)
+                if res is not None:
+                    request["served_by"] = leg.get("model")
+                self.hedger.record(hedged, hedge_won=res is not None and hedged and leg is secondary)
+                return res, error
+
+            # Primary slow (hedge) or already failed (failover): send the other leg
+            if not secondary_sent:
+                secondary_sent = True
+                if breaker_for(secondary).allow_request():
+                    hedged = bool(pending)  # primary still in flight
+                    if hedged:
+                        self.logger.info(f"🪁 Hedging {primary['label']} request to {secondary['label']}")
+                    else:
+                        self.logger.warning(
+                            f"↪️ {primary['label']} unavailable, failing over to {secondary['label']}"
+                        )
+                    future = _HEDGE_POOL.submit(self._send_with_retries, secondary, stream, cancel, True)
+                    legs[future] = secondary
+                    pending.add(future)
+
+        self.hedger.record(hedged, hedge_won=False)
+        return None, error
+
+    def _send_with_retries(self, request, stream=False, cancel=None, unread=False):
+        """
+        POST a chat request, retrying 429/5xx and network errors.
+
+        Returns ``(response, error, provider_failed)``; ``provider_failed``
+        is True when the provider itself is unhealthy (retryable errors
+        outlasted the retry policy), as opposed to e.g. a rejected request.
+        Setting the optional ``cancel`` event stops further retries.
+
+        ``stream`` asks the provider for ``stream: true``; the response body
+        is left unread for streams and, with ``unread``, for plain replies.
+
+        Every attempt first waits for a slot from the provider's rate
+        limiter; that wait counts against the retry deadline.
+        """
+        label = request["label"]
+        policy = get_retry_policy(request["provider"])
+        scheduler = get_scheduler(request["provider"])
+        deadline = policy.start()
+        payload = dict(request["payload"], stream=True) if stream else request["payload"]
+
+        attempt = 0
+        while True:
+            attempt += 1
+            retry_after = None
+            if scheduler is not None and not scheduler.acquire(
+                *self._rate_limit_args(request),
+                timeout=deadline - time.monotonic(),
+                cancel=cancel,
+            ):
+                return None, f"❌ {label} Error: rate limit wait exceeded the time budget", False
+
+            sent_at = time.monotonic()
+            try:
+                res = self.http.send(
+                    request["provider"],
+                    "POST",
+                    request["url"],
+                    stream=stream or unread,
+                    headers=request["headers"],
+                    json=payload,
+                    timeout=policy.attempt_timeout(deadline)
+                )
+            except httpx.TransportError as e:
+                error = f"❌ {label} Error: {str(e)}"
+            else:
+                if res.status_code == 200:
+                    self.hedger.observe(request["provider"], time.monotonic() - sent_at)
+                    return res, None, False
+
+                res.read()
+                res.close()
+                error = f"❌ {label} Error: {res.status_code} - {res.text}"
+                if not policy.retries_status(res.status_code):
+                    return None, error, False
+                retry_after = res.headers.get("Retry-After")
+                if res.status_code == 429:
+                    self._rate_limited(scheduler, policy, retry_after)
+
+            delay = policy.next_delay(attempt, deadline, retry_after)
+            if delay is None:
+                return None, error, True
+
+            if cancel is not None and cancel.is_set():
+                return None, error, False
+
+            self.logger.warning(f"🔁 {label} attempt {attempt} failed, retrying in {delay:.1f}s")
+            if cancel is not None:
+                cancel.wait(delay)
+            else:
+                time.sleep(delay)
+
+    def _complete(self, request):
+        """Send a chat request and return the full reply text"""
+        if request.get("parts"):
+            return self._complete_parts(request)
         try:
-            headers = {
-                "Authorization": f"Bearer {self.groq_key}",
-                "Content-Type": "application/json"
-            }
-
-            payload = {
-                "model": model,
-                "messages": [
-                    {"role": "user", "content": prompt}
-                ],
-                "temperature": temperature,
-                "max_tokens": max_tokens
-            }
-
-            response = requests.post(
-                self.groq_url,
-                json=payload,
-                headers=headers,
-                timeout=60
-            )
+            res, error = self._send(request)
+            if error:
+                return error
 
-            if response.status_code != 200:
-                return f"❌ Groq Error: {response.text}"
+            res.read()  # hedged legs arrive as unread streams
+            out = res.json()
+            return out["choices"][0]["message"]["content"]
 
-            data = response.json()
-            return data["choices"][0]["message"]["content"]
+        except Exception as e:
+            return f"❌ {request['label']} Error: {str(e)}"
+
+    def _stream(self, request):
+        """Send a chat request with ``stream: true`` and yield content deltas"""
+        if request.get("parts"):
+            yield from self._stream_parts(request)
+            return
+        try:
+            res, error = self._send(request, stream=True)
+            if error:
+                yield error
+                return
+
+            try:
+                yield from iter_sse_deltas(res.iter_lines())
+            finally:
+                res.close()
 
         except Exception as e:
-            return f"❌ Groq Error: {str(e)}"
+            yield f"❌ {request['label']} Error: {str(e)}"
+
+    # ------------------------------------------------------
+    # Split vision requests: parts run in parallel, answers merged in order.
+    # Each answer is stripped on its own: stripping the merged text would
+    # collapse the headings and separators into one line.
+    # ------------------------------------------------------
+    def _part_heading(self, part, index):
+        first, last, total = part["images"]
+        images = f"Image {first}" if first == last else f"Images {first}-{last}"
+        separator = "\n\n---\n\n" if index else ""
+        return f"{separator}**{images} of {total}**\n\n"
+
+    def _merge_parts(self, request, replies):
+        if any(reply.startswith(("❌", "⚠️")) for reply in replies):
+            request["partial"] = True  # don't cache an answer with holes
+        return "".join(
+            self._part_heading(part, i) + self._strip_all_html(reply)
+            for i, (part, reply) in enumerate(zip(request["parts"], replies))
+        )
+
+    def _complete_parts(self, request):
+        futures = [_VISION_POOL.submit(self._complete, part) for part in request["parts"]]
+        return self._merge_parts(request, [future.result() for future in futures])
+
+    def _stream_parts(self, request):
+        """Stream the first batch's answer live while the others complete"""
+        first, *rest = request["parts"]
+        futures = [_VISION_POOL.submit(self._complete, part) for part in rest]
+
+        yield self._part_heading(first, 0)
+        stripper = HTMLStripStream()
+        for delta in self._stream(first):
+            yield stripper.feed(delta)
+        yield stripper.close()
+        for i, (part, future) in enumerate(zip(rest, futures), start=1):
+            yield self._part_heading(part, i)
+            yield self._strip_all_html(future.result())
+
+    # ------------------------------------------------------
+    # Groq Text-only Models
+    # ------------------------------------------------------
+    def _call_groq_text(self, prompt, model, temperature=0.7, max_tokens=2048):
+        return self._complete(self._groq_request(prompt, model, temperature, max_tokens))
 
     # ------------------------------------------------------
     # HuggingFace Text Model (Llama-3.1-8B via multiple providers)
     # ------------------------------------------------------
     def _call_hf_text(self, prompt, temperature=0.7, max_tokens=1024):
         try:
-            if not self.hf_token:
-                raise ValueError("HF_TOKEN missing in .env")
-
-            headers = {
-                "Authorization": f"Bearer {self.hf_token}",
-                "Content-Type": "application/json"
-            }
-
-            # Use Llama-3.1-8B-Instruct via Cerebras (fastest provider)
-            # Format: model-name:provider is required for HF Router API
-            payload = {
-                "model": "meta-llama/Llama-3.1-8B-Instruct:cerebras",
-                "messages": [
-                    {"role": "user", "content": prompt}
-                ],
-                "max_tokens": max_tokens,
-                "temperature": temperature
-            }
-
-            res = requests.post(self.hf_url, headers=headers, json=payload, timeout=60)
-            
-            if res.status_code != 200:
-                return f"❌ HF Response Error: {res.status_code} - {res.text}"
-
-            out = res.json()
-            return out["choices"][0]["message"]["content"]
-
+            request = self._hf_text_request(prompt, temperature, max_tokens)
         except Exception as e:
             return f"❌ HuggingFace Text Error: {str(e)}"
+        return self._complete(request)
 
     # ------------------------------------------------------
     # HuggingFace Vision (Qwen2.5-VL via Router API)
     # ------------------------------------------------------
     def _call_hf_vision(self, prompt, files, temperature=0.7, max_tokens=1024):
         try:
+            request = self._vision_request(prompt, files, temperature, max_tokens)
+        except Exception as e:
+            return f"❌ HuggingFace Vision Error: {str(e)}"
+        return self._complete(request)
+
+    # ------------------------------------------------------
+    # Text backend failover (same Llama-3.1-8B family on both)
+    # ------------------------------------------------------
+    def _text_request(self, model, prompt, temperature, max_tokens, history=None):
+        """Request for a text model key, or None if its API key is missing"""
+        # Windowed per model: the two backends have different context lengths
+        context = self._history_window(model, prompt, max_tokens, history)
+        if model == "phi-3-mini":
+            request = self._hf_text_request(prompt, temperature, max_tokens, context) if self.hf_token else None
+        elif model in self.GROQ_MODEL_MAP:
+            request = (
+                self._groq_request(prompt, self.GROQ_MODEL_MAP[model], temperature, max_tokens, context)
+                if self.groq_key else None
+            )
+        else:
+            request = None
+
+        if request is not None:
+            request["model"] = model
+        return request
+
+    def _with_failover(self, model, prompt, temperature, max_tokens, history=None):
+        """Primary text request with the partner backend attached as fallback"""
+        request = self._text_request(model, prompt, temperature, max_tokens, history)
+        partner = self.TEXT_FAILOVER.get(model)
+        if partner:
+            request["fallback"] = self._text_request(partner, prompt, temperature, max_tokens, history)
+        return request
+
+    # ------------------------------------------------------
+    # Attached documents -> prompt text
+    # ------------------------------------------------------
+    def _with_documents(self, prompt, files):
+        """
+        ``prompt`` preceded by the text of attached PDFs / text files (within
+        the document token budget) and a note naming files the model can't see
+        """
+        context, unread = document_context(files, prompt)
+        if not context:
+            return FILES_NOTE + prompt
+        if unread:
+            names = ", ".join(f.get("name", "file") for f in unread)
+            context = UNREAD_FILES_NOTE.format(names=names) + context
+        return context + prompt
+
+    # ------------------------------------------------------
+    # Routing: UI model key -> provider request
+    # ------------------------------------------------------
+    def _route(self, question, model, temperature=0.7, max_tokens=2048, files=None, history=None):
+        """
+        Build the provider request for a UI model key.
+
+        ``history`` is the chat transcript so far; the turns that fit the
+        model's context window are sent ahead of the question.
+
+        Returns a request dict, or a user-facing error string when the
+        model can't be used (missing key, missing image, unknown model).
+        """
+        prompt = question.strip()
+        files = files or []
+
+        # Debug logging
+        self.logger.info(f"🔍 Model selected: {model}")
+        self.logger.info(f"📝 Prompt length: {len(prompt)} chars")
+        self.logger.info(f"📎 Files attached: {len(files)}")
+
+        # ------------- PHI-3 MINI MODEL (HuggingFace) --------------
+        if model == "phi-3-mini":
+            self.logger.info("✅ Routing to HuggingFace Llama-3.1-8B (Cerebras)")
             if not self.hf_token:
-                raise ValueError("HF_TOKEN missing in .env")
-
-            headers = {
-                "Authorization": f"Bearer {self.hf_token}",
-                "Content-Type": "application/json"
-            }
-
-            # Expecting only 1 file at a time
-            f = files[0]
-            image_b64 = f["data"]  # Base64 image string
-
-            # Use data URI for base64 image (assuming JPEG; adjust mime type if needed)
-            image_data_uri = f"data:image/jpeg;base64,{image_b64}"
-
-            payload = {
-                "model": "Qwen/Qwen2.5-VL-7B-Instruct:hyperbolic",
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": prompt
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": image_data_uri
-                                }
-                            }
-                        ]
-                    }
-                ],
-                "max_tokens": max_tokens,
-                "temperature": temperature
-            }
-
-            res = requests.post(self.hf_url, headers=headers, json=payload, timeout=60)
-            
-            if res.status_code != 200:
-                return f"❌ HF Response Error: {res.status_code} - {res.text}"
+                return "❌ Missing HF_TOKEN in your .env"
 
-            out = res.json()
-            return out["choices"][0]["message"]["content"]
+            if files:
+                prompt = self._with_documents(prompt, files)
 
-        except Exception as e:
-            return f"❌ HuggingFace Vision Error: {str(e)}"
+            return self._with_failover(model, prompt, temperature, max_tokens, history)
+
+        # ------------- VISION MODEL (HuggingFace) --------------
+        if model == "hf-vision":
+            self.logger.info("✅ Routing to HuggingFace Vision")
+            if not self.hf_token:
+                return "❌ Missing HF_TOKEN in your .env"
+
+            images = [f for f in files if f.get("type", "").startswith("image/")]
+            if not images:
+                return "⚠️ Please upload an image for the vision model."
+
+            documents = [f for f in files if f not in images]
+            if documents:
+                prompt = document_context(documents, prompt)[0] + prompt
+
+            context = self._history_window(model, prompt, max_tokens, history)
+            request = self._vision_request(prompt, images, temperature, max_tokens, context)
+            request["model"] = model
+            return request
+
+        # ------------- GROQ MODELS --------------
+        if model in self.GROQ_MODEL_MAP:
+            self.logger.info(f"✅ Routing to Groq: {self.GROQ_MODEL_MAP[model]}")
+            if not self.groq_key:
+                return "❌ Missing GROQ_API_KEY in your .env"
+
+            if files:
+                prompt = self._with_documents(prompt, files)
+
+            return self._with_failover(model, prompt, temperature, max_tokens, history)
+
+        # ------------- UNKNOWN MODEL --------------
+        self.logger.error(f"❌ Unknown model: {model}")
+        return f"❌ Unknown model selected: {model}"
 
     # ------------------------------------------------------
     # Public method: Auto-select model
     # ------------------------------------------------------
-    def generate_response(self, question, model, temperature=0.7, max_tokens=2048, files=None):
+    def generate_response(self, question, model, temperature=0.7, max_tokens=2048, files=None, session_id=None, history=None):
+        self.served_model = model
         try:
-            prompt = question.strip()
-            files = files or []
-            
-            # Debug logging
-            self.logger.info(f"🔍 Model selected: {model}")
-            self.logger.info(f"📝 Prompt length: {len(prompt)} chars")
-            self.logger.info(f"📎 Files attached: {len(files)}")
-
-            # ------------- PHI-3 MINI MODEL (HuggingFace) --------------
-            if model == "phi-3-mini":
-                self.logger.info("✅ Routing to HuggingFace Llama-3.1-8B (Cerebras)")
-                if not self.hf_token:
-                    return "❌ Missing HF_TOKEN in your .env"
-                
-                if files:
-                    prompt = (
-                        "⚠️ Note: This model cannot see uploaded files.\n"
-                        "Only answering based on text:\n\n" + prompt
-                    )
-                
-                reply = self._call_hf_text(prompt, temperature, max_tokens)
-                return self._strip_all_html(reply)
-
-            # ------------- VISION MODEL (HuggingFace) --------------
-            if model == "hf-vision":
-                self.logger.info("✅ Routing to HuggingFace Vision")
-                if not self.hf_token:
-                    return "❌ Missing HF_TOKEN in your .env"
-                
-                if not files:
-                    return "⚠️ Please upload an image for the vision model."
-                
-                reply = self._call_hf_vision(prompt, files, temperature, max_tokens)
-                return self._strip_all_html(reply)
-
-            # ------------- GROQ MODELS --------------
-            # Only Groq-supported models go in this map
-            groq_model_map = {
-                "llama-3.1-8b-instant": "llama-3.1-8b-instant",
-            }
-            
-            if model in groq_model_map:
-                self.logger.info(f"✅ Routing to Groq: {groq_model_map[model]}")
-                if not self.groq_key:
-                    return "❌ Missing GROQ_API_KEY in your .env"
-                
-                real_model = groq_model_map[model]
-                
-                if files:
-                    prompt = (
-                        "⚠️ Note: This model cannot see uploaded files.\n"
-                        "Only answering based on text:\n\n" + prompt
-                    )
-                
-                reply = self._call_groq_text(prompt, real_model, temperature, max_tokens)
-                return self._strip_all_html(reply)
-
-            # ------------- UNKNOWN MODEL --------------
-            self.logger.error(f"❌ Unknown model: {model}")
-            return f"❌ Unknown model selected: {model}"
+            context = self._history_window(model, question, max_tokens, history)
+            key = self._cache_key(question, model, temperature, max_tokens, files, context)
+            cached = self._cache_lookup(key, question, model, files, context)
+            if cached is not None:
+                return cached
+
+            started = time.perf_counter()
+            request = self._route(question, model, temperature, max_tokens, files, history)
+            if isinstance(request, str):
+                return request
+            self._tag_session(request, session_id)
+
+            reply = self._strip_reply(request, self._complete(request))
+            self.served_model = request.get("served_by", model)
+            if not request.get("partial"):
+                self._cache_store(key, question, model, files, reply, started, context)
+            return reply
 
         except Exception as e:
             return f"❌ AI Error: {str(e)}"
+
+    # ------------------------------------------------------
+    # Public method: Streaming variant of generate_response
+    # ------------------------------------------------------
+    def generate_response_stream(self, question, model, temperature=0.7, max_tokens=2048, files=None, session_id=None, history=None):
+        """
+        Yield the reply as HTML-stripped text deltas while it is generated.
+
+        Concatenating the deltas gives the same text ``generate_response``
+        would have returned; errors are yielded as a single message.
+        """
+        self.served_model = model
+        try:
+            context = self._history_window(model, question, max_tokens, history)
+            key = self._cache_key(question, model, temperature, max_tokens, files, context)
+            cached = self._cache_lookup(key, question, model, files, context)
+            if cached is not None:
+                yield cached
+                return
+
+            started = time.perf_counter()
+            request = self._route(question, model, temperature, max_tokens, files, history)
+            if isinstance(request, str):
+                yield request
+                return
+            self._tag_session(request, session_id)
+
+            # Split requests stream out already stripped
+            stripper = None if request.get("parts") else HTMLStripStream()
+            parts = []
+            for delta in self._stream(request):
+                if delta.startswith("❌"):
+                    key = None  # transport error mid-stream: don't cache
+                text = stripper.feed(delta) if stripper else delta
+                if text:
+                    parts.append(text)
+                    yield text
+
+            tail = stripper.close() if stripper else ""
+            if tail:
+                parts.append(tail)
+                yield tail
+
+            self.served_model = request.get("served_by", model)
+            self._cache_store(key, question, model, files, "".join(parts), started, context)
+
+        except Exception as e:
+            yield f"❌ AI Error: {str(e)}"
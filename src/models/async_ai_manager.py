@@ -0,0 +1,437 @@
+"""
+Asyncio-native AIManager
+
+Provider calls run as coroutines on one shared background event loop, so
+many in-flight generations cost sockets rather than OS threads. The sync
+methods (``generate_response`` / ``generate_response_stream``) keep the
+AIManager interface for the Streamlit script thread and can be cancelled
+per session with ``cancel``.
+"""
+import asyncio
+import queue
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import CancelledError, Future
+from typing import Dict, Optional, Set
+
+import httpx
+
+from src.models.ai_manager import AIManager
+from src.models.circuit_breaker import CLOSED, breaker_for
+from src.models.http_pool import get_async_http_pool
+from src.models.rate_limiter import get_scheduler
+from src.models.retry import get_retry_policy
+from src.models.streaming import SSE_DONE, HTMLStripStream, parse_sse_line
+
+CANCELLED_MESSAGE = "⚠️ Generation cancelled."
+
+_STREAM_END = object()
+
+
+async def _aclose_losing_leg(task):
+    """Drop the response of a hedge leg that finished but lost the race"""
+    if task.cancelled() or task.exception() is not None:
+        return
+    res = task.result()[0]
+    if res is not None:
+        await res.aclose()
+
+
+class _BackgroundLoop:
+    """A daemon thread running one event loop for the whole process"""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(
+            target=self.loop.run_forever,
+            name="ai-event-loop",
+            daemon=True,
+        )
+        self.thread.start()
+
+    def submit(self, coro) -> Future:
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+
+_loop: Optional[_BackgroundLoop] = None
+_loop_lock = threading.Lock()
+
+
+def get_background_loop() -> _BackgroundLoop:
+    """Return the process-wide background event loop, starting it if needed"""
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                _loop = _BackgroundLoop()
+    return _loop
+
+
+class AsyncAIManager(AIManager):
+    """AIManager whose provider calls are asyncio coroutines"""
+
+    # In-flight generations per session, shared by every instance
+    # (Streamlit builds a new manager on each rerun)
+    _inflight: Dict[str, Set[Future]] = defaultdict(set)
+    _inflight_lock = threading.Lock()
+
+    # ------------------------------------------------------
+    # Async transport (same breaker / retry policy as AIManager)
+    # ------------------------------------------------------
+    async def _asend(self, request, stream=False):
+        """Async counterpart of ``AIManager._send`` (breaker + failover)"""
+        if (
+            self.hedging
+            and request.get("fallback")
+            and breaker_for(request).state == CLOSED
+        ):
+            return await self._asend_hedged(request, stream)
+
+        candidates = [request]
+        if request.get("fallback"):
+            candidates.append(request["fallback"])
+
+        error = None
+        for i, candidate in enumerate(candidates):
+            breaker = breaker_for(candidate)
+            is_last = i == len(candidates) - 1
+
+            if not breaker.allow_request():
+                error = f"❌ {candidate['label']} Error: temporarily unavailable (circuit open)"
+            else:
+                res, error, provider_failed = await self._asend_with_retries(candidate, stream)
+                if not provider_failed:
+                    breaker.record_success()
+                    if res is not None:
+                        request["served_by"] = candidate.get("model")
+                    return res, error
+                breaker.record_failure()
+
+            if not is_last:
+                self.logger.warning(
+                    f"↪️ {candidate['label']} unavailable, failing over to {candidates[i + 1]['label']}"
+                )
+
+        return None, error
+
+    async def _asend_hedged(self, request, stream=False):
+        """Async counterpart of ``AIManager._send_hedged``; the loser is cancelled"""
+        primary, secondary = request, request["fallback"]
+
+        legs, error = {}, None
+        if breaker_for(primary).allow_request():
+            legs[asyncio.ensure_future(self._asend_with_retries(primary, stream, unread=True))] = primary
+        else:
+            # Opened since _asend checked it: fail over without a race
+            error = f"❌ {primary['label']} Error: temporarily unavailable (circuit open)"
+        pending = set(legs)
+        timeout = self.hedger.delay_for(primary["provider"])
+        hedged = secondary_sent = False
+
+        try:
+            while pending or not secondary_sent:
+                if pending:
+                    done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                else:
+                    done = set()
+                timeout = None
+
+                for task in done:
+                    res, error, provider_failed = task.result()
+                    leg = legs[task]
+                    breaker = breaker_for(leg)
+                    if provider_failed:
+                        breaker.record_failure()
+                        continue
+                    breaker.record_success()
+
+                    for loser in done - {task}:  # finished in the same wait()
+                        await _aclose_losing_leg(loser)
+                    if res is not None:
+                        request["served_by"] = leg.get("model")
+                    self.hedger.record(hedged, hedge_won=res is not None and hedged and leg is secondary)
+                    return res, error
+
+                if not secondary_sent:
+                    secondary_sent = True
+                    if breaker_for(secondary).allow_request():
+                        hedged = bool(pending)  # primary still in flight
+                        if hedged:
+                            self.logger.info(f"🪁 Hedging {primary['label']} request to {secondary['label']}")
+                        else:
+                            self.logger.warning(
+                                f"↪️ {primary['label']} unavailable, failing over to {secondary['label']}"
+                            )
+                        task = asyncio.ensure_future(self._asend_with_retries(secondary, stream, unread=True))
+                        legs[task] = secondary
+                        pending.add(task)
+
+            self.hedger.record(hedged, hedge_won=False)
+            return None, error
+
+        finally:
+            # Cancel the losing leg (closes its connection mid-request)
+            for task in pending:
+                task.cancel()
+
+    async def _asend_with_retries(self, request, stream=False, unread=False):
+        """Async counterpart of ``AIManager._send_with_retries``"""
+        label = request["label"]
+        policy = get_retry_policy(request["provider"])
+        scheduler = get_scheduler(request["provider"])
+        deadline = policy.start()
+        payload = dict(request["payload"], stream=True) if stream else request["payload"]
+
+        attempt = 0
+        while True:
+            attempt += 1
+            retry_after = None
+            if scheduler is not None and not await scheduler.acquire_async(
+                *self._rate_limit_args(request),
+                timeout=deadline - time.monotonic(),
+            ):
+                return None, f"❌ {label} Error: rate limit wait exceeded the time budget", False
+
+            sent_at = time.monotonic()
+            try:
+                res = await get_async_http_pool().send(
+                    request["provider"],
+                    "POST",
+                    request["url"],
+                    stream=stream or unread,
+                    headers=request["headers"],
+                    json=payload,
+                    timeout=policy.attempt_timeout(deadline)
+                )
+            except httpx.TransportError as e:
+                error = f"❌ {label} Error: {str(e)}"
+            else:
+                if res.status_code == 200:
+                    self.hedger.observe(request["provider"], time.monotonic() - sent_at)
+                    return res, None, False
+
+                await res.aread()
+                await res.aclose()
+                error = f"❌ {label} Error: {res.status_code} - {res.text}"
+                if not policy.retries_status(res.status_code):
+                    return None, error, False
+                retry_after = res.headers.get("Retry-After")
+                if res.status_code == 429:
+                    self._rate_limited(scheduler, policy, retry_after)
+
+            delay = policy.next_delay(attempt, deadline, retry_after)
+            if delay is None:
+                return None, error, True
+
+            self.logger.warning(f"🔁 {label} attempt {attempt} failed, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def _acomplete(self, request):
+        """Send a chat request and return the full reply text"""
+        if request.get("parts"):
+            replies = await asyncio.gather(*(self._acomplete(part) for part in request["parts"]))
+            return self._merge_parts(request, replies)
+        try:
+            res, error = await self._asend(request)
+            if error:
+                return error
+
+            await res.aread()  # hedged legs arrive as unread streams
+            out = res.json()
+            return out["choices"][0]["message"]["content"]
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            return f"❌ {request['label']} Error: {str(e)}"
+
+    async def _astream(self, request):
+        """Send a chat request with ``stream: true`` and yield content deltas"""
+        if request.get("parts"):
+            async for delta in self._astream_parts(request):
+                yield delta
+            return
+        try:
+            res, error = await self._asend(request, stream=True)
+            if error:
+                yield error
+                return
+
+            try:
+                async for line in res.aiter_lines():
+                    delta = parse_sse_line(line)
+                    if delta is SSE_DONE:
+                        break
+                    if delta:
+                        yield delta
+            finally:
+                await res.aclose()
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            yield f"❌ {request['label']} Error: {str(e)}"
+
+    async def _astream_parts(self, request):
+        """Stream the first batch's answer live while the others complete"""
+        first, *rest = request["parts"]
+        tasks = [asyncio.ensure_future(self._acomplete(part)) for part in rest]
+        try:
+            yield self._part_heading(first, 0)
+            stripper = HTMLStripStream()
+            async for delta in self._astream(first):
+                yield stripper.feed(delta)
+            yield stripper.close()
+            for i, (part, task) in enumerate(zip(rest, tasks), start=1):
+                yield self._part_heading(part, i)
+                yield self._strip_all_html(await task)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    # ------------------------------------------------------
+    # Public async API
+    # ------------------------------------------------------
+    async def agenerate_response(self, question, model, temperature=0.7, max_tokens=2048, files=None, session_id=None, history=None):
+        self.served_model = model
+        try:
+            context = self._history_window(model, question, max_tokens, history)
+            key = self._cache_key(question, model, temperature, max_tokens, files, context)
+            cached = self._cache_lookup(key, question, model, files, context)
+            if cached is not None:
+                return cached
+
+            started = time.perf_counter()
+            # Off the event loop: routing may read PDFs and resize images
+            request = await asyncio.to_thread(self._route, question, model, temperature, max_tokens, files, history)
+            if isinstance(request, str):
+                return request
+            self._tag_session(request, session_id)
+
+            reply = self._strip_reply(request, await self._acomplete(request))
+            self.served_model = request.get("served_by", model)
+            if not request.get("partial"):
+                self._cache_store(key, question, model, files, reply, started, context)
+            return reply
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            return f"❌ AI Error: {str(e)}"
+
+    async def agenerate_response_stream(self, question, model, temperature=0.7, max_tokens=2048, files=None, session_id=None, history=None):
+        self.served_model = model
+        try:
+            context = self._history_window(model, question, max_tokens, history)
+            key = self._cache_key(question, model, temperature, max_tokens, files, context)
+            cached = self._cache_lookup(key, question, model, files, context)
+            if cached is not None:
+                yield cached
+                return
+
+            started = time.perf_counter()
+            # Off the event loop: routing may read PDFs and resize images
+            request = await asyncio.to_thread(self._route, question, model, temperature, max_tokens, files, history)
+            if isinstance(request, str):
+                yield request
+                return
+            self._tag_session(request, session_id)
+
+            # Split requests stream out already stripped
+            stripper = None if request.get("parts") else HTMLStripStream()
+            parts = []
+            async for delta in self._astream(request):
+                if delta.startswith("❌"):
+                    key = None  # transport error mid-stream: don't cache
+                text = stripper.feed(delta) if stripper else delta
+                if text:
+                    parts.append(text)
+                    yield text
+
+            tail = stripper.close() if stripper else ""
+            if tail:
+                parts.append(tail)
+                yield tail
+
+            self.served_model = request.get("served_by", model)
+            self._cache_store(key, question, model, files, "".join(parts), started, context)
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            yield f"❌ AI Error: {str(e)}"
+
+    # ------------------------------------------------------
+    # Sync facade (same signatures as AIManager + session_id)
+    # ------------------------------------------------------
+    def generate_response(self, question, model, temperature=0.7, max_tokens=2048, files=None, session_id=None, history=None):
+        future = self._submit(
+            self.agenerate_response(question, model, temperature, max_tokens, files, session_id, history),
+            session_id,
+        )
+        try:
+            return future.result()
+        except CancelledError:
+            return CANCELLED_MESSAGE
+        finally:
+            future.cancel()
+            self._forget(session_id, future)
+
+    def generate_response_stream(self, question, model, temperature=0.7, max_tokens=2048, files=None, session_id=None, history=None):
+        deltas = queue.Queue()
+
+        async def pump():
+            try:
+                async for delta in self.agenerate_response_stream(
+                    question, model, temperature, max_tokens, files, session_id, history
+                ):
+                    deltas.put(delta)
+            finally:
+                deltas.put(_STREAM_END)
+
+        future = self._submit(pump(), session_id)
+        try:
+            while True:
+                delta = deltas.get()
+                if delta is _STREAM_END:
+                    break
+                yield delta
+
+            if future.cancelled():
+                yield CANCELLED_MESSAGE
+        finally:
+            # Also reached when the consumer stops early (rerun, page change)
+            future.cancel()
+            self._forget(session_id, future)
+
+    def cancel(self, session_id):
+        """Cancel every in-flight generation for a session; returns the count"""
+        with self._inflight_lock:
+            futures = self._inflight.pop(session_id, set())
+
+        cancelled = 0
+        for future in futures:
+            if future.cancel():
+                cancelled += 1
+
+        if cancelled:
+            self.logger.info(f"🛑 Cancelled {cancelled} generation(s) for session {session_id}")
+        return cancelled
+
+    def _submit(self, coro, session_id) -> Future:
+        future = get_background_loop().submit(coro)
+        if session_id is not None:
+            with self._inflight_lock:
+                self._inflight[session_id].add(future)
+        return future
+
+    def _forget(self, session_id, future):
+        if session_id is None:
+            return
+        with self._inflight_lock:
+            futures = self._inflight.get(session_id)
+            if futures is not None:
+                futures.discard(future)
+                if not futures:
+                    del self._inflight[session_id]
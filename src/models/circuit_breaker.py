@@ -0,0 +1,122 @@
+"""
+Per-provider circuit breakers
+
+A breaker opens after ``failure_threshold`` consecutive failed calls and
+rejects requests immediately for ``recovery_timeout`` seconds. It then
+goes half-open and lets a limited number of probe calls through: one
+success closes it again, one failure re-opens it. A probe that reports
+neither within ``recovery_timeout`` (a cancelled stream, an abandoned
+hedge leg) is written off and the next call may probe instead.
+"""
+import threading
+import time
+from typing import Dict
+
+from src.core.config import Config
+from src.utils.logger import setup_logger
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 3,
+        recovery_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+
+        self.logger = setup_logger()
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probed_at = 0.0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _maybe_half_open(self):
+        now = time.monotonic()
+        if self._state == OPEN and now - self._opened_at >= self.recovery_timeout:
+            self._state = HALF_OPEN
+            self._probes = 0
+        elif (
+            self._state == HALF_OPEN
+            and self._probes >= self.half_open_max_calls
+            and now - self._probed_at >= self.recovery_timeout
+        ):
+            # The probes never reported back: let new ones through
+            self._probes = 0
+
+    def allow_request(self) -> bool:
+        """True if a call may go out now (counts as a probe when half-open)"""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._probes < self.half_open_max_calls:
+                self._probes += 1
+                self._probed_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != CLOSED:
+                self.logger.info(f"🟢 Circuit '{self.name}' closed")
+            self._state = CLOSED
+            self._failures = 0
+            self._probes = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self.logger.warning(
+                        f"🔴 Circuit '{self.name}' opened after {self._failures} failure(s)"
+                    )
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._probes = 0
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(provider: str) -> CircuitBreaker:
+    """Return the process-wide breaker for a backend key (see ``breaker_for``)"""
+    breaker = _breakers.get(provider)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(provider)
+            if breaker is None:
+                breaker = CircuitBreaker(
+                    provider,
+                    failure_threshold=Config.BREAKER_FAILURE_THRESHOLD,
+                    recovery_timeout=Config.BREAKER_RECOVERY_TIMEOUT,
+                    half_open_max_calls=Config.BREAKER_HALF_OPEN_MAX_CALLS,
+                )
+                _breakers[provider] = breaker
+    return breaker
+
+
+def breaker_for(request: dict) -> CircuitBreaker:
+    """
+    Breaker for the backend a chat request goes to: provider and model, so
+    an HF vision outage doesn't shut off HF text (and the text failover)
+    """
+    return get_circuit_breaker(f"{request['provider']}:{request['payload']['model']}")
@@ -0,0 +1,152 @@
+"""
+Token-budgeted conversation history for multi-turn requests
+
+``build_history`` turns the chat transcript (``st.session_state.messages``)
+into chat-completion ``messages`` that fit next to the new question in the
+model's context window. The most recent turns are kept verbatim, newest
+first. Older turns that no longer fit are folded into a short system note
+listing what was asked earlier, so prompt size stays bounded however long
+the conversation gets.
+"""
+from typing import List, Optional, Tuple
+
+from src.core.constants import ModelConstants
+from src.utils.helpers import truncate_text
+
+# Role / separator tokens the chat template adds around every message
+MESSAGE_OVERHEAD = 4
+
+# Headroom for estimator error and the files note added while routing
+SAFETY_MARGIN = 128
+
+SUMMARY_HEADER = "Earlier in this conversation the student asked about:\n"
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Fast local token estimate: ~4 UTF-8 bytes per token.
+
+    Counting bytes rather than characters keeps non-Latin scripts (which
+    byte-level BPE tokenizers split more finely) from being underestimated.
+    """
+    if not text:
+        return 0
+    return (len(text.encode("utf-8")) + 3) // 4
+
+
+def message_tokens(message: dict) -> int:
+    return estimate_tokens(message.get("content", "")) + MESSAGE_OVERHEAD
+
+
+def context_length(model: str) -> int:
+    info = ModelConstants.AVAILABLE_MODELS.get(model)
+    return info["context_length"] if info else ModelConstants.DEFAULT_CONTEXT_LENGTH
+
+
+def history_budget(model: str, prompt: str, max_tokens: int, limit: int) -> int:
+    """Tokens left for history once the question and the reply are reserved"""
+    room = (
+        context_length(model)
+        - max_tokens
+        - estimate_tokens(prompt)
+        - MESSAGE_OVERHEAD
+        - SAFETY_MARGIN
+    )
+    return max(0, min(room, limit))
+
+
+def completed_turns(messages: List[dict]) -> List[Tuple[str, str]]:
+    """
+    (question, answer) pairs from a transcript, oldest first.
+
+    Unanswered questions (including the one being asked now) and error /
+    warning replies are skipped together with their question, so roles
+    still alternate user/assistant.
+    """
+    turns = []
+    pending = None
+    for message in messages or []:
+        role = message.get("role")
+        content = str(message.get("content") or "").strip()
+        if role == "user":
+            pending = content
+        elif role == "assistant":
+            if pending and content and not content.startswith(("❌", "⚠️")):
+                turns.append((pending, content))
+            pending = None
+    return turns
+
+
+def summarize_turns(turns: List[Tuple[str, str]], budget: int) -> Optional[str]:
+    """Compact note of dropped turns: the opening of each question, newest kept first"""
+    lines = []
+    used = estimate_tokens(SUMMARY_HEADER) + MESSAGE_OVERHEAD
+    for question, _ in reversed(turns):
+        line = "- " + truncate_text(" ".join(question.split()), 160)
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget:
+            break
+        lines.append(line)
+        used += cost
+
+    if not lines:
+        return None
+    return SUMMARY_HEADER + "\n".join(reversed(lines))
+
+
+def _pair(question: str, answer: str) -> List[dict]:
+    return [
+        {"role": "user", "content": question},
+        {"role": "assistant", "content": answer},
+    ]
+
+
+def build_history(messages: List[dict], budget: int, summary_tokens: int = 300) -> List[dict]:
+    """
+    History ``messages`` for the next request, within ``budget`` tokens.
+
+    Args:
+        messages: Chat transcript; entries need ``role`` and ``content``
+        budget: Token budget for everything returned
+        summary_tokens: Part of the budget set aside for the summary of
+            dropped turns (only when some turns have to be dropped)
+    """
+    turns = completed_turns(messages)
+    if not turns or budget <= 0:
+        return []
+
+    costs = [sum(message_tokens(m) for m in _pair(q, a)) for q, a in turns]
+    if sum(costs) <= budget:
+        return [m for q, a in turns for m in _pair(q, a)]
+
+    # Keep the newest turns that fit, leaving room for the summary
+    verbatim_budget = max(0, budget - summary_tokens)
+    kept = 0
+    used = 0
+    for cost in reversed(costs):
+        if used + cost > verbatim_budget:
+            break
+        used += cost
+        kept += 1
+
+    history = []
+    dropped = turns[:len(turns) - kept]
+    recent = turns[len(turns) - kept:]
+
+    if not recent:
+        # The last turn alone is too long: keep it with its answer cut down,
+        # since follow-ups usually refer to it
+        question, answer = dropped.pop()
+        room = verbatim_budget - estimate_tokens(question) - 2 * MESSAGE_OVERHEAD
+        if room > 0:
+            recent = [(question, truncate_text(answer, room * 4))]
+            used = sum(message_tokens(m) for m in _pair(*recent[0]))
+        else:
+            dropped.append((question, answer))
+
+    summary = summarize_turns(dropped, budget - used)
+    if summary:
+        history.append({"role": "system", "content": summary})
+    for question, answer in recent:
+        history.extend(_pair(question, answer))
+    return history
@@ -0,0 +1,111 @@
+"""
+Hedged-request bookkeeping
+
+``Hedger`` keeps a rolling window of time-to-first-byte per provider and
+turns it into the hedge delay: if the primary hasn't answered within its
+usual p-th percentile, a duplicate request goes to the other backend.
+It also counts how often that happens and which leg wins.
+"""
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from src.core.config import Config
+
+
+class LatencyTracker:
+    """Rolling window of latency samples (seconds)"""
+
+    def __init__(self, window: int = 200):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, p: float) -> Optional[float]:
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+class Hedger:
+    def __init__(
+        self,
+        percentile: float = 95,
+        default_delay: float = 2.0,
+        min_delay: float = 0.1,
+        min_samples: int = 20,
+    ):
+        self.percentile = percentile
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+
+        self._trackers: Dict[str, LatencyTracker] = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def _tracker(self, provider: str) -> LatencyTracker:
+        with self._lock:
+            tracker = self._trackers.get(provider)
+            if tracker is None:
+                tracker = self._trackers[provider] = LatencyTracker()
+            return tracker
+
+    def observe(self, provider: str, seconds: float):
+        """Record a successful time-to-first-byte for a provider"""
+        self._tracker(provider).observe(seconds)
+
+    def delay_for(self, provider: str) -> float:
+        """Seconds to wait on the primary before sending the hedge"""
+        tracker = self._tracker(provider)
+        if len(tracker) < self.min_samples:
+            return self.default_delay
+        return max(self.min_delay, tracker.percentile(self.percentile))
+
+    def record(self, hedged: bool, hedge_won: bool):
+        with self._lock:
+            self.requests += 1
+            if hedged:
+                self.hedged += 1
+            if hedge_won:
+                self.hedge_wins += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "hedged": self.hedged,
+                "hedge_wins": self.hedge_wins,
+                "hedge_rate": self.hedged / self.requests if self.requests else 0.0,
+                "win_rate": self.hedge_wins / self.hedged if self.hedged else 0.0,
+            }
+
+
+_hedger: Optional[Hedger] = None
+_hedger_lock = threading.Lock()
+
+
+def get_hedger() -> Hedger:
+    """Return the process-wide hedger"""
+    global _hedger
+    if _hedger is None:
+        with _hedger_lock:
+            if _hedger is None:
+                _hedger = Hedger(
+                    percentile=Config.HEDGE_PERCENTILE,
+                    default_delay=Config.HEDGE_DEFAULT_DELAY,
+                    min_delay=Config.HEDGE_MIN_DELAY,
+                    min_samples=Config.HEDGE_MIN_SAMPLES,
+                )
+    return _hedger
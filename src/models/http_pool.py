@@ -0,0 +1,164 @@
+"""
+Pooled, keep-alive HTTP clients for AI provider calls
+"""
+import asyncio
+import threading
+import weakref
+from typing import Dict, Optional
+
+import httpx
+
+from src.core.config import Config
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class HTTPClientPool:
+    """
+    Process-wide registry of keep-alive httpx clients, one per provider.
+
+    Streamlit re-executes the app script (and builds a new AIManager) on
+    every rerun, so the pool lives at module level and each provider keeps
+    its TCP/TLS connections warm across turns and sessions. httpx clients
+    are safe to share between threads; the lock only guards creation.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = Config.HTTP_POOL_SIZE,
+        keepalive_connections: int = Config.HTTP_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = Config.HTTP_KEEPALIVE_EXPIRY,
+        timeout: float = Config.HTTP_TIMEOUT,
+        http2: bool = Config.HTTP2_ENABLED,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=min(keepalive_connections, pool_size),
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(timeout, connect=min(timeout, 10.0))
+        self.http2 = http2 and HTTP2_AVAILABLE
+
+        self._clients: Dict[str, httpx.Client] = {}
+        self._lock = threading.Lock()
+
+    def get(self, provider: str) -> httpx.Client:
+        """Return the shared client for a provider, creating it on first use"""
+        client = self._clients.get(provider)
+        if client is not None:
+            return client
+
+        with self._lock:
+            client = self._clients.get(provider)
+            if client is None:
+                client = httpx.Client(
+                    limits=self.limits,
+                    timeout=self.timeout,
+                    http2=self.http2,
+                )
+                self._clients[provider] = client
+            return client
+
+    def send(self, provider: str, method: str, url: str, stream: bool = False,
+             timeout: Optional[float] = None, **kwargs) -> httpx.Response:
+        """
+        Send a request on the provider's client.
+
+        With ``stream=True`` the body is not read; the caller must close
+        the response to release the connection back to the pool.
+        """
+        client = self.get(provider)
+        request = client.build_request(method, url, timeout=timeout, **kwargs)
+        return client.send(request, stream=stream)
+
+    def close(self):
+        """Close every pooled client and drop its connections"""
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients.clear()
+
+
+class AsyncHTTPClientPool:
+    """
+    Async counterpart of HTTPClientPool: one httpx.AsyncClient per provider.
+
+    An AsyncClient is bound to the event loop it first ran on, so pools are
+    handed out per loop by ``get_async_http_pool``.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = Config.HTTP_POOL_SIZE,
+        keepalive_connections: int = Config.HTTP_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = Config.HTTP_KEEPALIVE_EXPIRY,
+        timeout: float = Config.HTTP_TIMEOUT,
+        http2: bool = Config.HTTP2_ENABLED,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=min(keepalive_connections, pool_size),
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(timeout, connect=min(timeout, 10.0))
+        self.http2 = http2 and HTTP2_AVAILABLE
+
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def get(self, provider: str) -> httpx.AsyncClient:
+        """Return the shared async client for a provider"""
+        client = self._clients.get(provider)
+        if client is None:
+            client = httpx.AsyncClient(
+                limits=self.limits,
+                timeout=self.timeout,
+                http2=self.http2,
+            )
+            self._clients[provider] = client
+        return client
+
+    async def send(self, provider: str, method: str, url: str, stream: bool = False,
+                   timeout: Optional[float] = None, **kwargs) -> httpx.Response:
+        """Async counterpart of ``HTTPClientPool.send``"""
+        client = self.get(provider)
+        request = client.build_request(method, url, timeout=timeout, **kwargs)
+        return await client.send(request, stream=stream)
+
+    async def aclose(self):
+        """Close every pooled async client"""
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+
+
+_pool: Optional[HTTPClientPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_http_pool() -> HTTPClientPool:
+    """Return the process-wide HTTP client pool"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = HTTPClientPool()
+    return _pool
+
+
+_async_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncHTTPClientPool]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_async_http_pool() -> AsyncHTTPClientPool:
+    """Return the async client pool for the running event loop"""
+    loop = asyncio.get_running_loop()
+    pool = _async_pools.get(loop)
+    if pool is None:
+        pool = AsyncHTTPClientPool()
+        _async_pools[loop] = pool
+    return pool
@@ -0,0 +1,248 @@
+"""
+Client-side rate limiting and request scheduling per provider API key
+
+Every user of a deployment shares one GROQ_API_KEY and one HF_TOKEN, so
+bursts from a few sessions can trip the provider's limits for everyone.
+``RequestScheduler`` holds two token buckets per provider (requests per
+minute and tokens per minute) and hands out send slots:
+
+- short prompts go through a priority lane ahead of long ones
+- within a lane, sessions take turns (round robin), so one busy session
+  can't starve the others
+- a 429 with Retry-After pauses the whole provider, not just one request
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Optional
+
+from src.core.config import Config
+
+
+def estimate_prompt_tokens(payload: dict) -> int:
+    """Rough prompt size of a chat payload (~4 characters per token)"""
+    chars = 0
+    for message in payload.get("messages", []):
+        content = message.get("content", "")
+        if isinstance(content, list):
+            chars += sum(len(part.get("text", "")) for part in content if part.get("type") == "text")
+        else:
+            chars += len(str(content))
+    return chars // 4 + 1
+
+
+class TokenBucket:
+    """Classic token bucket; ``rate`` tokens per second up to ``capacity``"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` tokens are available (0 if now)"""
+        self._refill(now)
+        # A request bigger than the bucket can never fit; let it through
+        # once the bucket is full rather than blocking it forever
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+
+class _Ticket:
+    """One waiting request (compared by identity)"""
+
+    __slots__ = ("lane", "session_id", "tokens")
+
+    def __init__(self, lane: int, session_id, tokens: int):
+        self.lane = lane
+        self.session_id = session_id
+        self.tokens = tokens
+
+
+class RequestScheduler:
+    """Fair, rate-limited admission of requests to one provider"""
+
+    def __init__(self, name: str, rpm: int, tpm: int, short_prompt_tokens: int = 200):
+        self.name = name
+        self.short_prompt_tokens = short_prompt_tokens
+        self.requests = TokenBucket(rpm / 60.0, rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm / 60.0, tpm) if tpm > 0 else None
+
+        self._cond = threading.Condition()
+        # lane -> session -> queue of tickets; lane 0 is the priority lane
+        self._lanes = (OrderedDict(), OrderedDict())
+        self._paused_until = 0.0
+
+        self.granted = 0
+        self.total_wait = 0.0
+
+    # ------------------------------------------------------
+    # Queue bookkeeping (callers hold self._cond)
+    # ------------------------------------------------------
+    def _enqueue(self, session_id, tokens: int, prompt_tokens: int):
+        lane = 0 if prompt_tokens <= self.short_prompt_tokens else 1
+        ticket = _Ticket(lane, session_id, tokens)
+        self._lanes[lane].setdefault(session_id, deque()).append(ticket)
+        return ticket
+
+    def _remove(self, ticket):
+        sessions = self._lanes[ticket.lane]
+        queue = sessions.get(ticket.session_id)
+        if queue is None or ticket not in queue:
+            return
+        queue.remove(ticket)
+        if queue:
+            sessions.move_to_end(ticket.session_id)  # next session's turn
+        else:
+            del sessions[ticket.session_id]
+
+    def _head(self):
+        for lane in self._lanes:
+            if lane:
+                return next(iter(lane.values()))[0]
+        return None
+
+    def _try_grant(self, ticket) -> float:
+        """Grant ``ticket`` if it is at the head and budget allows; else seconds to wait"""
+        if self._head() is not ticket:
+            return 0.05
+
+        now = time.monotonic()
+        wait = max(0.0, self._paused_until - now)
+        tokens = ticket.tokens
+        if self.requests is not None:
+            wait = max(wait, self.requests.wait_time(1, now))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.wait_time(tokens, now))
+        if wait > 0:
+            return wait
+
+        if self.requests is not None:
+            self.requests.take(1)
+        if self.tokens is not None:
+            self.tokens.take(tokens)
+        self._remove(ticket)
+        self.granted += 1
+        self._cond.notify_all()
+        return 0.0
+
+    # ------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------
+    def acquire(
+        self,
+        session_id,
+        tokens: int,
+        prompt_tokens: int,
+        timeout: Optional[float] = None,
+        cancel: Optional[threading.Event] = None,
+    ) -> bool:
+        """
+        Block until the request may be sent.
+
+        Returns False if ``timeout`` ran out or ``cancel`` was set first.
+        """
+        started = time.monotonic()
+        with self._cond:
+            ticket = self._enqueue(session_id, tokens, prompt_tokens)
+            while True:
+                wait = self._try_grant(ticket)
+                if wait == 0:
+                    self.total_wait += time.monotonic() - started
+                    return True
+
+                if cancel is not None:
+                    if cancel.is_set():
+                        self._remove(ticket)
+                        self._cond.notify_all()
+                        return False
+                    wait = min(wait, 0.25)
+
+                if timeout is not None:
+                    remaining = timeout - (time.monotonic() - started)
+                    if remaining <= 0:
+                        self._remove(ticket)
+                        self._cond.notify_all()
+                        return False
+                    wait = min(wait, remaining)
+                self._cond.wait(wait)
+
+    async def acquire_async(self, session_id, tokens: int, prompt_tokens: int, timeout: Optional[float] = None) -> bool:
+        """Coroutine version of ``acquire`` (polls instead of blocking the loop)"""
+        started = time.monotonic()
+        with self._cond:
+            ticket = self._enqueue(session_id, tokens, prompt_tokens)
+        try:
+            while True:
+                with self._cond:
+                    wait = self._try_grant(ticket)
+                    if wait == 0:
+                        self.total_wait += time.monotonic() - started
+                        ticket = None
+                        return True
+
+                    if timeout is not None:
+                        remaining = timeout - (time.monotonic() - started)
+                        if remaining <= 0:
+                            return False
+                        wait = min(wait, remaining)
+                await asyncio.sleep(min(wait, 0.25))
+        finally:
+            if ticket is not None:
+                with self._cond:
+                    self._remove(ticket)
+                    self._cond.notify_all()
+
+    def pause(self, seconds: float):
+        """Hold all requests for ``seconds`` (e.g. after a 429 with Retry-After)"""
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "granted": self.granted,
+                "queued": sum(len(q) for lane in self._lanes for q in lane.values()),
+                "avg_wait": self.total_wait / self.granted if self.granted else 0.0,
+            }
+
+
+_LIMITS = {
+    "groq": ("GROQ_RPM", "GROQ_TPM"),
+    "hf": ("HF_RPM", "HF_TPM"),
+}
+
+_schedulers: Dict[str, RequestScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(provider: str) -> Optional[RequestScheduler]:
+    """Return the process-wide scheduler for a provider, or None when disabled"""
+    if not Config.RATE_LIMIT_ENABLED:
+        return None
+
+    scheduler = _schedulers.get(provider)
+    if scheduler is None:
+        with _schedulers_lock:
+            scheduler = _schedulers.get(provider)
+            if scheduler is None:
+                rpm_name, tpm_name = _LIMITS.get(provider, (None, None))
+                scheduler = RequestScheduler(
+                    provider,
+                    rpm=getattr(Config, rpm_name, 0) if rpm_name else 0,
+                    tpm=getattr(Config, tpm_name, 0) if tpm_name else 0,
+                    short_prompt_tokens=Config.RATE_LIMIT_SHORT_PROMPT_TOKENS,
+                )
+                _schedulers[provider] = scheduler
+    return scheduler
@@ -0,0 +1,230 @@
+"""
+Response cache for deterministic (low-temperature) completions
+
+Keys are SHA-256 hashes of (model, normalized prompt, temperature,
+max_tokens, attachment hashes, earlier turns sent along). Two
+interchangeable backends are provided: an in-process LRU and an on-disk
+SQLite table under ``Config.DATA_DIR``. Both evict by LRU order and by TTL.
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from src.core.config import Config
+from src.utils.helpers import calculate_file_hash, sanitize_input
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Case- and whitespace-insensitive form of a prompt"""
+    return sanitize_input(prompt or "").casefold()
+
+
+def make_cache_key(model, prompt, temperature, max_tokens, files=None, context=None) -> str:
+    """Build the cache key for one request (``context``: earlier turns sent with it)"""
+    parts = {
+        "model": model,
+        "prompt": normalize_prompt(prompt),
+        "temperature": round(float(temperature), 3),
+        "max_tokens": int(max_tokens),
+        "files": [
+            f.get("hash") or calculate_file_hash(str(f.get("data", "")).encode("utf-8"))
+            for f in (files or [])
+        ],
+    }
+    if context:
+        parts["context"] = [[m["role"], normalize_prompt(m["content"])] for m in context]
+    return calculate_file_hash(json.dumps(parts, sort_keys=True).encode("utf-8"))
+
+
+class LRUCacheBackend:
+    """In-process LRU with per-entry TTL"""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            created, value = entry
+            if time.time() - created > self.ttl:
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: dict):
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCacheBackend:
+    """On-disk cache shared by every process using the same file"""
+
+    def __init__(self, path: Path, max_entries: int = 10000, ttl: float = 86400):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS response_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_response_cache_accessed ON response_cache (accessed)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            value, created = row
+            if now - created > self.ttl:
+                self._conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+
+            self._conn.execute(
+                "UPDATE response_cache SET accessed = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+        return json.loads(value)
+
+    def put(self, key: str, value: dict):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            self._conn.execute(
+                """
+                DELETE FROM response_cache WHERE key IN (
+                    SELECT key FROM response_cache ORDER BY accessed DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+            self._conn.execute("DELETE FROM response_cache WHERE created < ?", (now - self.ttl,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM response_cache")
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+
+
+class ResponseCache:
+    """
+    Front end over a cache backend with hit/miss accounting.
+
+    Only requests at or below ``max_temperature`` are cacheable; above it
+    the same prompt is expected to produce different answers.
+    """
+
+    def __init__(self, backend, max_temperature: float = 0.2):
+        self.backend = backend
+        self.max_temperature = max_temperature
+
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self.saved_tokens = 0
+
+    def is_cacheable(self, temperature) -> bool:
+        return float(temperature) <= self.max_temperature
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self.backend.get(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.saved_seconds += entry.get("latency", 0.0)
+            self.saved_tokens += entry.get("tokens", 0)
+        return entry["reply"]
+
+    def put(self, key: str, reply: str, latency: float = 0.0, tokens: int = 0):
+        self.backend.put(key, {"reply": reply, "latency": latency, "tokens": tokens})
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "saved_seconds": round(self.saved_seconds, 3),
+                "saved_tokens": self.saved_tokens,
+                "entries": len(self.backend),
+            }
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Return the process-wide response cache, or None when disabled"""
+    global _cache
+    if not Config.RESPONSE_CACHE_ENABLED:
+        return None
+
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                if Config.RESPONSE_CACHE_BACKEND == "sqlite":
+                    backend = SQLiteCacheBackend(
+                        Config.DATA_DIR / "response_cache.db",
+                        max_entries=Config.RESPONSE_CACHE_MAX_ENTRIES,
+                        ttl=Config.RESPONSE_CACHE_TTL,
+                    )
+                else:
+                    backend = LRUCacheBackend(
+                        max_entries=Config.RESPONSE_CACHE_MAX_ENTRIES,
+                        ttl=Config.RESPONSE_CACHE_TTL,
+                    )
+                _cache = ResponseCache(backend, Config.RESPONSE_CACHE_MAX_TEMPERATURE)
+    return _cache
@@ -0,0 +1,116 @@
+"""
+Retry policy for provider calls: exponential backoff with full jitter,
+Retry-After support and a total deadline budget
+"""
+import os
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+from src.core.config import Config
+
+RETRYABLE_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+
+def parse_retry_after(value) -> Optional[float]:
+    """Parse a Retry-After header (delta-seconds or HTTP-date) into seconds"""
+    if not value:
+        return None
+
+    value = str(value).strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """
+    When and how long to wait before retrying a failed provider call.
+
+    Args:
+        max_attempts: Total attempts including the first one
+        base_delay: Backoff for the first retry, doubled each attempt
+        max_delay: Upper bound on a single backoff
+        deadline: Budget in seconds for all attempts and waits together
+        timeout: Per-attempt request timeout (capped by the remaining budget)
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        deadline: float = 90.0,
+        timeout: float = 60.0,
+        retry_statuses=RETRYABLE_STATUSES,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.timeout = timeout
+        self.retry_statuses = frozenset(retry_statuses)
+
+    def retries_status(self, status_code: int) -> bool:
+        return status_code in self.retry_statuses
+
+    def start(self) -> float:
+        """Monotonic time at which the budget runs out"""
+        return time.monotonic() + self.deadline
+
+    def attempt_timeout(self, deadline: float) -> float:
+        return max(1.0, min(self.timeout, deadline - time.monotonic()))
+
+    def next_delay(self, attempt: int, deadline: float, retry_after=None) -> Optional[float]:
+        """
+        Seconds to wait before attempt ``attempt + 1``, or None to give up.
+
+        Full jitter (uniform in [0, backoff]) spreads out clients that
+        failed together; a Retry-After from the server is a lower bound.
+        If the wait would overrun the deadline, give up now instead of
+        sleeping into a certain failure.
+        """
+        if attempt >= self.max_attempts:
+            return None
+
+        backoff = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        delay = random.uniform(0, backoff)
+
+        server_delay = parse_retry_after(retry_after)
+        if server_delay is not None:
+            delay = max(delay, server_delay)
+
+        if time.monotonic() + delay >= deadline:
+            return None
+        return delay
+
+
+def _setting(provider: str, name: str, default):
+    """Per-provider override, e.g. GROQ_RETRY_MAX_ATTEMPTS, else the global value"""
+    value = os.getenv(f"{provider.upper()}_RETRY_{name}")
+    return type(default)(value) if value is not None else default
+
+
+_policies: Dict[str, RetryPolicy] = {}
+
+
+def get_retry_policy(provider: str) -> RetryPolicy:
+    """Return the retry policy for a provider key ("groq", "hf", ...)"""
+    policy = _policies.get(provider)
+    if policy is None:
+        policy = RetryPolicy(
+            max_attempts=_setting(provider, "MAX_ATTEMPTS", Config.RETRY_MAX_ATTEMPTS),
+            base_delay=_setting(provider, "BASE_DELAY", Config.RETRY_BASE_DELAY),
+            max_delay=_setting(provider, "MAX_DELAY", Config.RETRY_MAX_DELAY),
+            deadline=_setting(provider, "DEADLINE", Config.RETRY_DEADLINE),
+            timeout=Config.HTTP_TIMEOUT,
+        )
+        _policies[provider] = policy
+    return policy
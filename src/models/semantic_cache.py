@@ -0,0 +1,234 @@
+"""
+Semantic near-duplicate question cache
+
+Prompts are embedded locally (CPU only, no network) as signed, hashed
+character n-gram vectors and compared by cosine similarity against a
+bounded per-model index, so rephrasings such as "what is a derivative"
+and "explain derivatives" can reuse an earlier answer. The vectors ignore
+word order, so a hit also needs the words both prompts share to come in
+the same order ("celsius to fahrenheit" is not "fahrenheit to celsius").
+"""
+import re
+import threading
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.core.config import Config
+from src.models.response_cache import normalize_prompt
+
+_WORD_RE = re.compile(r"\w+")
+_TERM_RE = re.compile(r"\S+")
+
+# Question boilerplate that carries no topic information
+_FILLER_WORDS = frozenset({
+    "a", "an", "the", "is", "are", "was", "were", "be", "of", "to", "in",
+    "on", "for", "and", "or", "me", "my", "i", "you", "it", "this", "that",
+    "what", "whats", "how", "why", "does", "do", "can", "could", "would",
+    "please", "explain", "define", "describe", "tell", "about", "give",
+})
+
+
+def _content_words(text: str) -> List[str]:
+    """Lower-cased words minus filler, with a crude plural strip"""
+    words = []
+    for word in _WORD_RE.findall(normalize_prompt(text)):
+        if word in _FILLER_WORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.append(word)
+    return words
+
+
+def exact_terms(text: str) -> Tuple[str, ...]:
+    """
+    Terms that must match exactly for two prompts to share an answer.
+
+    N-gram similarity barely changes between "derivative of x^2" and
+    "derivative of x^3", so numbers (and the symbols around them) are
+    compared literally instead.
+    """
+    return tuple(sorted(t for t in _TERM_RE.findall(normalize_prompt(text)) if any(c.isdigit() for c in t)))
+
+
+def same_word_order(words: Tuple[str, ...], other: Tuple[str, ...]) -> bool:
+    """True if the content words two prompts share appear in the same order"""
+    shared = set(words) & set(other)
+    return [w for w in words if w in shared] == [w for w in other if w in shared]
+
+
+class HashedNgramEmbedder:
+    """Feature-hashed bag of words and character n-grams, L2-normalized"""
+
+    def __init__(self, dim: int = 256, ngram_range: Tuple[int, int] = (3, 5)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+
+    def _features(self, text: str) -> List[str]:
+        words = _content_words(text)
+        features = []
+        low, high = self.ngram_range
+        for word in words:
+            features.append(word)
+            padded = f" {word} "
+            for n in range(low, high + 1):
+                features.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+        return features
+
+    def embed(self, text: str) -> np.ndarray:
+        """Return a unit-length float32 vector (all zeros for empty text)"""
+        vector = np.zeros(self.dim, dtype=np.float32)
+        features = self._features(text)
+        if not features:
+            return vector
+
+        hashes = np.fromiter(
+            (zlib.crc32(f.encode("utf-8")) for f in features),
+            dtype=np.uint32,
+            count=len(features),
+        )
+        signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+        np.add.at(vector, hashes % self.dim, signs)
+
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return vector
+
+
+class SemanticIndex:
+    """
+    Fixed-capacity matrix of unit vectors searched with one mat-vec product.
+
+    Storage grows by doubling up to ``capacity``; after that the oldest
+    entry is overwritten (ring buffer), so memory is bounded at
+    ``capacity * dim * 4`` bytes plus the stored values.
+    """
+
+    def __init__(self, dim: int, capacity: int):
+        self.dim = dim
+        self.capacity = capacity
+        self.vectors = np.empty((min(capacity, 64), dim), dtype=np.float32)
+        self.values: List[Optional[tuple]] = []
+        self.size = 0
+        self._next = 0
+
+    def _reserve(self, rows: int):
+        if rows <= len(self.vectors):
+            return
+        grown = np.empty((min(self.capacity, max(rows, 2 * len(self.vectors))), self.dim), dtype=np.float32)
+        grown[:self.size] = self.vectors[:self.size]
+        self.vectors = grown
+
+    def add(self, vector: np.ndarray, value):
+        if self.size < self.capacity:
+            self._reserve(self.size + 1)
+            self.vectors[self.size] = vector
+            self.values.append(value)
+            self.size += 1
+            return
+
+        self.vectors[self._next] = vector
+        self.values[self._next] = value
+        self._next = (self._next + 1) % self.capacity
+
+    def add_many(self, vectors: np.ndarray, values: list):
+        """Bulk insert (used for warm-loading and benchmarks)"""
+        take = min(len(vectors), self.capacity - self.size)
+        self._reserve(self.size + take)
+        self.vectors[self.size:self.size + take] = vectors[:take]
+        self.values.extend(values[:take])
+        self.size += take
+        for vector, value in zip(vectors[take:], values[take:]):
+            self.add(vector, value)
+
+    def search(self, vector: np.ndarray) -> Tuple[float, Optional[tuple]]:
+        """Return (best cosine similarity, value) or (0.0, None) when empty"""
+        if self.size == 0:
+            return 0.0, None
+        scores = self.vectors[:self.size] @ vector
+        best = int(np.argmax(scores))
+        return float(scores[best]), self.values[best]
+
+    @property
+    def nbytes(self) -> int:
+        return self.vectors.nbytes
+
+
+class SemanticCache:
+    """Per-model semantic indexes with hit/miss accounting"""
+
+    def __init__(self, threshold: float = 0.9, capacity_per_model: int = 10000, dim: int = 256):
+        self.threshold = threshold
+        self.capacity_per_model = capacity_per_model
+        self.embedder = HashedNgramEmbedder(dim=dim)
+
+        self._partitions: Dict[str, SemanticIndex] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _partition(self, model: str) -> SemanticIndex:
+        index = self._partitions.get(model)
+        if index is None:
+            index = SemanticIndex(self.embedder.dim, self.capacity_per_model)
+            self._partitions[model] = index
+        return index
+
+    def lookup(self, model: str, prompt: str) -> Optional[str]:
+        """Return a cached reply for a near-duplicate prompt, if any"""
+        vector = self.embedder.embed(prompt)
+        with self._lock:
+            index = self._partitions.get(model)
+            score, entry = index.search(vector) if index is not None else (0.0, None)
+            if (
+                entry is not None
+                and score >= self.threshold
+                and entry[0] == exact_terms(prompt)
+                and same_word_order(entry[1], tuple(_content_words(prompt)))
+            ):
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+            return None
+
+    def add(self, model: str, prompt: str, reply: str):
+        vector = self.embedder.embed(prompt)
+        if not vector.any():
+            return
+        with self._lock:
+            self._partition(model).add(vector, (exact_terms(prompt), tuple(_content_words(prompt)), reply))
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": {model: index.size for model, index in self._partitions.items()},
+                "bytes": sum(index.nbytes for index in self._partitions.values()),
+            }
+
+
+_cache: Optional[SemanticCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_semantic_cache() -> Optional[SemanticCache]:
+    """Return the process-wide semantic cache, or None when disabled"""
+    global _cache
+    if not Config.SEMANTIC_CACHE_ENABLED:
+        return None
+
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SemanticCache(
+                    threshold=Config.SEMANTIC_CACHE_THRESHOLD,
+                    capacity_per_model=Config.SEMANTIC_CACHE_MAX_ENTRIES,
+                    dim=Config.SEMANTIC_CACHE_DIM,
+                )
+    return _cache
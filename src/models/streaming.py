@@ -0,0 +1,138 @@
+"""
+Helpers for streaming (SSE) chat completions
+"""
+import html
+import json
+import re
+from typing import Iterable, Iterator, Optional
+
+from src.core.exceptions import AIModelError
+
+_TAG_RE = re.compile(r"<[^>]*>")
+# As long as html.unescape looks for an entity name
+_PARTIAL_ENTITY_RE = re.compile(r"&#?\w{0,32}")
+_TOKEN_RE = re.compile(r"\S+|\s+")
+
+
+SSE_DONE = "[DONE]"
+
+
+def parse_sse_line(line: str) -> Optional[str]:
+    """
+    Parse one line of an OpenAI-compatible ``stream: true`` response.
+
+    Returns the content delta, ``SSE_DONE`` at end of stream, or None for
+    lines that carry no text (comments, keep-alives, role-only deltas).
+
+    Raises:
+        AIModelError: If the provider sends an error event mid-stream
+    """
+    if not line or not line.startswith("data:"):
+        return None
+
+    data = line[5:].strip()
+    if data == SSE_DONE:
+        return SSE_DONE
+
+    event = json.loads(data)
+    if "error" in event:
+        error = event["error"]
+        message = error.get("message", error) if isinstance(error, dict) else error
+        raise AIModelError(str(message))
+
+    choices = event.get("choices") or []
+    if not choices:
+        return None
+
+    return (choices[0].get("delta") or {}).get("content") or None
+
+
+def iter_sse_deltas(lines: Iterable[str]) -> Iterator[str]:
+    """Yield content deltas from the decoded lines of an event stream"""
+    for line in lines:
+        delta = parse_sse_line(line)
+        if delta is SSE_DONE:
+            break
+        if delta:
+            yield delta
+
+
+class HTMLStripStream:
+    """
+    Incremental counterpart of ``strip_all_html``.
+
+    Chunks are fed as they arrive; whatever can already be decided is
+    returned with tags removed, entities decoded and whitespace collapsed,
+    so the deltas join to the same text ``strip_all_html`` gives for the
+    whole reply. Text from the first ``<`` with no ``>`` after it is held
+    back until the next chunk (a later ``>`` would make it a tag), and so
+    is a trailing unfinished entity. The one difference: an unclosed
+    ``<`` is released as text once it is more than ``max_tag_hold``
+    characters old (so "x < 5" doesn't stall the stream).
+    """
+
+    def __init__(self, max_tag_hold: int = 256):
+        self.max_tag_hold = max_tag_hold
+        self._buffer = ""   # raw text from the first unclosed "<"
+        self._entity = ""   # tag-free text from a trailing unfinished entity
+        self._started = False
+        self._space = False
+
+    def feed(self, chunk: str) -> str:
+        """Add a chunk and return the text that is safe to display"""
+        text = self._buffer + (chunk or "")
+        hold = _unclosed_tag(text)
+        if hold != -1 and len(text) - hold > self.max_tag_hold:
+            # Too old to still be a tag; a later "<" may be
+            hold = text.find("<", len(text) - self.max_tag_hold)
+        if hold == -1:
+            hold = len(text)
+
+        self._buffer = text[hold:]
+        return self._decode(_TAG_RE.sub("", text[:hold]))
+
+    def close(self) -> str:
+        """Flush any held-back text at end of stream"""
+        text, self._buffer = self._buffer, ""
+        return self._decode(_TAG_RE.sub("", text), final=True)
+
+    def _decode(self, text: str, final: bool = False) -> str:
+        """Decode entities in tag-free text, holding back an unfinished one"""
+        text = self._entity + text
+        hold = len(text)
+        amp = text.rfind("&")
+        if not final and amp != -1 and _PARTIAL_ENTITY_RE.fullmatch(text, amp):
+            hold = amp
+
+        ready, self._entity = text[:hold], text[hold:]
+        return self._emit(html.unescape(ready))
+
+    def _emit(self, text: str) -> str:
+        if not text:
+            return ""
+
+        out = []
+        for token in _TOKEN_RE.findall(text):
+            if token.isspace():
+                self._space = self._started
+                continue
+            if self._space:
+                out.append(" ")
+                self._space = False
+            out.append(token)
+            self._started = True
+
+        return "".join(out)
+
+
+def _unclosed_tag(text: str) -> int:
+    """Index of the first "<" with no ">" after it, or -1"""
+    pos = 0
+    while True:
+        lt = text.find("<", pos)
+        if lt == -1:
+            return -1
+        gt = text.find(">", lt + 1)
+        if gt == -1:
+            return lt
+        pos = gt + 1
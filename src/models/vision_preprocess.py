@@ -0,0 +1,194 @@
+"""
+Image preprocessing for the vision model
+
+Uploads used to go to Qwen2.5-VL as-is: multi-megabyte PNGs labelled
+``image/jpeg``, EXIF (GPS included) and all. The model resizes every image
+to at most ``max_pixels`` anyway, in 28 px patches, so anything larger is
+bandwidth and tokenizer time for nothing. Before sending we:
+
+- detect the real format from the bytes
+- apply the EXIF rotation, then drop all metadata
+- downsample anything over ``VISION_MAX_PIXELS``, sides in multiples of 28
+- flatten transparency and recompress as JPEG at ``VISION_JPEG_QUALITY``
+
+If the re-encoded image isn't smaller and the original needed no resize
+and carries no EXIF, the original is sent, with its real MIME type.
+
+Several uploads are prepared in parallel and packed, in order, into
+batches that fit one request (``pack_images``).
+"""
+import base64
+import io
+import math
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from PIL import Image, ImageOps
+
+from src.core.config import Config
+from src.storage.attachment_store import attachment_bytes
+from src.utils.helpers import calculate_file_hash
+
+PATCH_SIZE = 28
+
+FORMAT_MIME = {
+    "JPEG": "image/jpeg",
+    "PNG": "image/png",
+    "WEBP": "image/webp",
+    "GIF": "image/gif",
+}
+
+
+@dataclass
+class PreparedImage:
+    data: bytes
+    mime_type: str
+    width: int
+    height: int
+    original_size: int
+
+    def data_uri(self) -> str:
+        return f"data:{self.mime_type};base64,{base64.b64encode(self.data).decode('utf-8')}"
+
+
+def target_size(width: int, height: int, max_pixels: int):
+    """
+    Size to send: unchanged if within ``max_pixels``, otherwise the largest
+    size within it that keeps the aspect ratio, sides multiples of 28
+    """
+    if width * height <= max_pixels:
+        return width, height
+    scale = math.sqrt(max_pixels / (width * height))
+    width, height = width * scale, height * scale
+    return (
+        max(PATCH_SIZE, int(width // PATCH_SIZE) * PATCH_SIZE),
+        max(PATCH_SIZE, int(height // PATCH_SIZE) * PATCH_SIZE),
+    )
+
+
+def prepare_image(data: bytes, max_pixels: int = None, quality: int = None) -> PreparedImage:
+    """Downsample, strip metadata and recompress one image for the vision model"""
+    max_pixels = max_pixels or Config.VISION_MAX_PIXELS
+    quality = quality or Config.VISION_JPEG_QUALITY
+
+    with Image.open(io.BytesIO(data)) as img:
+        source_format = img.format
+        has_exif = bool(img.getexif())
+        img = ImageOps.exif_transpose(img)
+
+        size = target_size(img.width, img.height, max_pixels)
+        resized = size != (img.width, img.height)
+        if resized:
+            img = img.resize(size, Image.LANCZOS)
+
+        if img.mode in ("RGBA", "LA", "P"):
+            # Transparent areas become white (like the page behind a scan)
+            img = img.convert("RGBA")
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            background.paste(img, mask=img.getchannel("A"))
+            img = background
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+
+        buffer = io.BytesIO()
+        img.save(buffer, "JPEG", quality=quality, optimize=True)
+        encoded = buffer.getvalue()
+
+    source_mime = FORMAT_MIME.get(source_format)
+    if not resized and not has_exif and source_mime and len(data) <= len(encoded):
+        return PreparedImage(data, source_mime, img.width, img.height, len(data))
+
+    return PreparedImage(encoded, "image/jpeg", img.width, img.height, len(data))
+
+
+# --------------------------------------------------
+# Cache (same upload asked about several times)
+# --------------------------------------------------
+PREPARED_CACHE_MAX_ENTRIES = 32
+
+_prepared_cache = OrderedDict()
+_prepared_cache_lock = threading.Lock()
+
+
+def prepare_attachment(file_ref: dict) -> PreparedImage:
+    """``prepare_image`` for a message attachment, cached by content hash"""
+    data = None if file_ref.get("hash") else attachment_bytes(file_ref)
+    key = (
+        file_ref.get("hash") or calculate_file_hash(data),
+        Config.VISION_MAX_PIXELS,
+        Config.VISION_JPEG_QUALITY,
+    )
+
+    with _prepared_cache_lock:
+        prepared = _prepared_cache.get(key)
+        if prepared is not None:
+            _prepared_cache.move_to_end(key)
+            return prepared
+
+    prepared = prepare_image(data if data is not None else attachment_bytes(file_ref))
+
+    with _prepared_cache_lock:
+        _prepared_cache[key] = prepared
+        while len(_prepared_cache) > PREPARED_CACHE_MAX_ENTRIES:
+            _prepared_cache.popitem(last=False)
+    return prepared
+
+
+def prepare_for_vision(file_ref: dict) -> PreparedImage:
+    """
+    What to send for an image attachment. Files Pillow can't read (or all
+    files, with preprocessing off) go as-is with unknown dimensions.
+    """
+    if Config.VISION_PREPROCESS_ENABLED:
+        try:
+            return prepare_attachment(file_ref)
+        except (OSError, Image.DecompressionBombError):
+            pass  # not something Pillow can read; let the provider decide
+
+    data = attachment_bytes(file_ref)
+    return PreparedImage(data, file_ref.get("type") or "image/jpeg", 0, 0, len(data))
+
+
+# --------------------------------------------------
+# Several images per question
+# --------------------------------------------------
+# Pillow releases the GIL while decoding and resampling
+_prepare_pool = ThreadPoolExecutor(max_workers=Config.VISION_PREPROCESS_WORKERS, thread_name_prefix="vision")
+
+
+def prepare_attachments(files) -> list:
+    """``prepare_for_vision`` for every file, in parallel, in upload order"""
+    if len(files) == 1:
+        return [prepare_for_vision(files[0])]
+    return list(_prepare_pool.map(prepare_for_vision, files))
+
+
+def image_pixels(image: PreparedImage) -> int:
+    # Unknown size (not preprocessed): assume the worst case
+    return image.width * image.height or Config.VISION_MAX_PIXELS
+
+
+def pack_images(images, max_pixels: int = None, max_images: int = None) -> list:
+    """
+    Split images, keeping their order, into batches of at most
+    ``max_images`` whose total pixels (the model's image tokens are
+    pixels / 28²) stay within ``max_pixels``. An image over the budget on
+    its own gets a batch to itself.
+    """
+    max_pixels = max_pixels or Config.VISION_BATCH_MAX_PIXELS
+    max_images = max_images or Config.VISION_BATCH_MAX_IMAGES
+
+    batches, current, pixels = [], [], 0
+    for image in images:
+        cost = image_pixels(image)
+        if current and (pixels + cost > max_pixels or len(current) >= max_images):
+            batches.append(current)
+            current, pixels = [], 0
+        current.append(image)
+        pixels += cost
+
+    if current:
+        batches.append(current)
+    return batches
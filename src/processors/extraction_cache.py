@@ -0,0 +1,44 @@
+"""
+Cache for text extracted from uploads (PDF pages, OCR results)
+
+Keyed by content hash and kind, so each upload is processed once: a small
+in-memory LRU in front of ``data/extracted/<hash>.<kind>.json``.
+"""
+import json
+import threading
+from collections import OrderedDict
+
+from src.core.config import Config
+from src.storage.attachment_store import write_atomic
+
+EXTRACTION_CACHE_MAX_ENTRIES = 16
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _cache_path(file_hash: str, kind: str):
+    return Config.EXTRACTED_DIR / f"{file_hash}.{kind}.json"
+
+
+def cached_extraction(file_hash: str, kind: str, extract):
+    """Result for ``(file_hash, kind)`` from memory, disk, or ``extract()`` (JSON-serializable)"""
+    key = (file_hash, kind)
+    with _cache_lock:
+        result = _cache.get(key)
+        if result is not None:
+            _cache.move_to_end(key)
+            return result
+
+    path = _cache_path(file_hash, kind)
+    try:
+        result = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        result = extract()
+        write_atomic(path, json.dumps(result).encode("utf-8"))
+
+    with _cache_lock:
+        _cache[key] = result
+        while len(_cache) > EXTRACTION_CACHE_MAX_ENTRIES:
+            _cache.popitem(last=False)
+    return result
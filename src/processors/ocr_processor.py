@@ -0,0 +1,150 @@
+"""
+OCR for image attachments, so text models can answer about photographed
+problems without the (slower) vision route
+
+Every variant in ``FileConstants.OCR_CONFIGS`` runs at the same time and
+the result with the highest mean word confidence wins. pytesseract runs
+each variant as its own ``tesseract`` process, so the worker threads here
+only wait on those. Results are cached by content hash.
+
+pytesseract and the tesseract binary are optional: without them
+``ocr_available()`` is False and ``ocr_image`` raises ``OCRError``.
+"""
+import io
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Optional
+
+from PIL import Image, ImageOps
+
+from src.core.config import Config
+from src.core.constants import FileConstants
+from src.core.exceptions import OCRError
+from src.processors.extraction_cache import cached_extraction
+from src.storage.attachment_store import attachment_bytes
+from src.utils.helpers import calculate_file_hash
+from src.utils.logger import setup_logger
+
+try:
+    import pytesseract
+except ImportError:
+    pytesseract = None
+
+logger = setup_logger()
+
+# Tesseract reads small text poorly; upscale images narrower than this
+MIN_OCR_WIDTH = 1500
+
+
+@dataclass
+class OCRResult:
+    text: str
+    confidence: float
+    config: str
+
+
+def tesseract_command() -> Optional[str]:
+    """Path of the tesseract binary (``TESSERACT_PATH`` or PATH), or None"""
+    if Path(Config.TESSERACT_PATH).is_file():
+        return Config.TESSERACT_PATH
+    return shutil.which("tesseract")
+
+
+_available = None
+
+
+def ocr_available() -> bool:
+    global _available
+    if _available is None:
+        command = tesseract_command() if pytesseract is not None else None
+        if command:
+            pytesseract.pytesseract.tesseract_cmd = command
+        _available = command is not None
+    return _available
+
+
+def prepare_for_ocr(data: bytes) -> Image.Image:
+    """Upright, grayscale, auto-contrasted and large enough for tesseract"""
+    with Image.open(io.BytesIO(data)) as img:
+        img = ImageOps.exif_transpose(img)
+        img = ImageOps.autocontrast(img.convert("L"))
+    if img.width < MIN_OCR_WIDTH:
+        scale = MIN_OCR_WIDTH / img.width
+        img = img.resize((MIN_OCR_WIDTH, round(img.height * scale)), Image.LANCZOS)
+    return img
+
+
+def run_tesseract(img: Image.Image, config: str) -> OCRResult:
+    """One OCR pass; text rebuilt line by line from the word boxes"""
+    data = pytesseract.image_to_data(img, config=config, output_type=pytesseract.Output.DICT)
+
+    lines, confidences = {}, []
+    for i, word in enumerate(data["text"]):
+        confidence = float(data["conf"][i])
+        if confidence < 0 or not word.strip():
+            continue  # layout rows (-1) and empty boxes
+        confidences.append(confidence)
+        line = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        lines.setdefault(line, []).append(word)
+
+    text = "\n".join(" ".join(words) for words in lines.values())
+    mean = sum(confidences) / len(confidences) if confidences else 0.0
+    return OCRResult(text, mean, config)
+
+
+_pool = ThreadPoolExecutor(max_workers=len(FileConstants.OCR_CONFIGS), thread_name_prefix="ocr")
+
+
+def best_result(results) -> OCRResult:
+    # Highest confidence; more recognised text breaks ties
+    return max(results, key=lambda r: (round(r.confidence), len(r.text)))
+
+
+def ocr_bytes(data: bytes) -> OCRResult:
+    """Run every configured variant concurrently and keep the most confident"""
+    if not ocr_available():
+        raise OCRError("OCR unavailable: install pytesseract and tesseract (or set TESSERACT_PATH)")
+
+    try:
+        img = prepare_for_ocr(data)
+    except (OSError, Image.DecompressionBombError) as e:
+        raise OCRError(f"Unreadable image: {e}") from e
+
+    futures = [_pool.submit(run_tesseract, img, config) for config in FileConstants.OCR_CONFIGS]
+    results, errors = [], []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:  # pytesseract.TesseractError, timeouts, ...
+            errors.append(e)
+
+    if not results:
+        raise OCRError(f"Tesseract failed: {errors[0]}")
+    return best_result(results)
+
+
+def ocr_image(file_ref: dict) -> OCRResult:
+    """OCR of an image attachment, cached by content hash"""
+    file_hash = file_ref.get("hash")
+
+    def extract():
+        result = ocr_bytes(attachment_bytes(file_ref))
+        logger.info(
+            f"🔎 OCR {file_ref.get('name', 'image')}: {len(result.text)} chars, "
+            f"confidence {result.confidence:.0f} ({result.config})"
+        )
+        return asdict(result)
+
+    if not file_hash:
+        file_hash = calculate_file_hash(attachment_bytes(file_ref))
+    return OCRResult(**cached_extraction(file_hash, "ocr", extract))
+
+
+def ocr_text(file_ref: dict) -> Optional[str]:
+    """Recognised text worth sending to a text model, or None"""
+    result = ocr_image(file_ref)
+    if result.confidence < Config.OCR_MIN_CONFIDENCE or not result.text.strip():
+        return None
+    return result.text
@@ -0,0 +1,230 @@
+"""
+PDF text extraction for the text models
+
+Pages are read one at a time from the stored file (``PdfReader`` on a
+path parses objects lazily, so the document is never held in memory as a
+whole). The extracted pages are cached by content hash
+(``extraction_cache``), so the same upload is only parsed once.
+
+PDFs with many pages are split into page ranges and extracted in a
+process pool (text extraction is pure Python and holds the GIL).
+
+Images are read with OCR (``ocr_processor``) when tesseract is installed.
+
+``document_context`` turns the extracted text into a prompt block that
+fits a token budget: if the whole text doesn't fit, the chunks sharing
+the most words with the question are kept, in page order.
+"""
+import multiprocessing
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+from PyPDF2 import PdfReader
+
+from src.core.config import Config
+from src.core.exceptions import FileProcessingError, OCRError
+from src.models.context_window import estimate_tokens
+from src.processors.extraction_cache import cached_extraction
+from src.processors.ocr_processor import ocr_available, ocr_text
+from src.storage.attachment_store import attachment_bytes, get_attachment_store
+from src.utils.logger import setup_logger
+
+logger = setup_logger()
+
+PDF_MIME = "application/pdf"
+TEXT_MIME = "text/plain"
+
+WORD_RE = re.compile(r"\w{3,}")
+
+# Question words too common to say which section is relevant
+STOPWORDS = {
+    "the", "and", "for", "are", "was", "what", "why", "how", "who", "when",
+    "where", "which", "this", "that", "with", "from", "does", "can", "you",
+    "please", "explain", "about", "into", "there", "their", "they", "have",
+}
+
+# "[page N]" marker and separators around each chunk
+CHUNK_OVERHEAD_TOKENS = 8
+
+
+# --------------------------------------------------
+# Extraction (runs in worker processes too)
+# --------------------------------------------------
+def iter_page_text(path, start: int = 0, stop: Optional[int] = None):
+    """Yield the text of pages ``start..stop`` one at a time"""
+    with open(path, "rb") as f:
+        reader = PdfReader(f)
+        if reader.is_encrypted:
+            reader.decrypt("")  # many "protected" PDFs use an empty user password
+        pages = reader.pages
+        for i in range(start, min(stop if stop is not None else len(pages), len(pages))):
+            yield pages[i].extract_text() or ""
+
+
+def extract_page_range(path, start: int, stop: int) -> List[str]:
+    return list(iter_page_text(path, start, stop))
+
+
+def count_pages(path) -> int:
+    with open(path, "rb") as f:
+        return len(PdfReader(f).pages)
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn: forking a process that runs Streamlit's threads is unsafe
+                _pool = ProcessPoolExecutor(
+                    max_workers=Config.PDF_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _pool
+
+
+def extract_pages(path) -> List[str]:
+    """Text of every page (up to ``PDF_MAX_PAGES``), in order"""
+    total = min(count_pages(path), Config.PDF_MAX_PAGES)
+    if total < Config.PDF_PARALLEL_MIN_PAGES or Config.PDF_WORKERS <= 1:
+        return extract_page_range(path, 0, total)
+
+    step = -(-total // Config.PDF_WORKERS)
+    futures = [
+        _get_pool().submit(extract_page_range, str(path), start, min(start + step, total))
+        for start in range(0, total, step)
+    ]
+    return [page for future in futures for page in future.result()]
+
+
+def pdf_pages(file_ref: dict) -> List[str]:
+    """Extracted text per page of a stored PDF"""
+    file_hash = file_ref["hash"]
+
+    def extract():
+        try:
+            pages = extract_pages(get_attachment_store().path(file_hash))
+        except Exception as e:  # malformed / encrypted PDFs fail in many ways
+            raise FileProcessingError(f"Could not read {file_ref.get('name', 'PDF')}: {e}") from e
+        logger.info(f"📄 Extracted {len(pages)} pages from {file_ref.get('name', 'PDF')}")
+        return pages
+
+    return cached_extraction(file_hash, "pdf", extract)
+
+
+def is_ocr_source(file_ref: dict) -> bool:
+    return file_ref.get("type", "").startswith("image/") and Config.OCR_ENABLED and ocr_available()
+
+
+def file_pages(file_ref: dict) -> Optional[List[str]]:
+    """Text of a PDF / text / image (OCR) attachment as pages, or None for other types"""
+    ftype = file_ref.get("type", "")
+    if ftype == PDF_MIME and file_ref.get("hash"):
+        return pdf_pages(file_ref)
+    if ftype == TEXT_MIME:
+        return [attachment_bytes(file_ref).decode("utf-8", errors="replace")]
+    if is_ocr_source(file_ref):
+        text = ocr_text(file_ref)
+        return [text] if text else None
+    return None
+
+
+# --------------------------------------------------
+# Prompt context within a token budget
+# --------------------------------------------------
+def chunk_pages(pages: List[str], chunk_tokens: int):
+    """(page number, text) chunks of about ``chunk_tokens`` each, split on paragraphs"""
+    for number, page in enumerate(pages, start=1):
+        current, size = [], 0
+        for paragraph in re.split(r"\n\s*\n", page):
+            # Extracted PDF text often has no blank lines: split long
+            # paragraphs on line breaks instead
+            units = paragraph.splitlines() if estimate_tokens(paragraph) > chunk_tokens else [paragraph]
+            for unit in units:
+                unit = unit.strip()
+                if not unit:
+                    continue
+                tokens = estimate_tokens(unit)
+                if current and size + tokens > chunk_tokens:
+                    yield number, "\n".join(current)
+                    current, size = [], 0
+                current.append(unit)
+                size += tokens
+        if current:
+            yield number, "\n".join(current)
+
+
+def select_chunks(chunks, question: str, budget: int):
+    """Chunks to send: all of them if they fit, else the most relevant, in order"""
+    sized = [(i, page, text, estimate_tokens(text) + CHUNK_OVERHEAD_TOKENS) for i, (page, text) in enumerate(chunks)]
+    if sum(size for *_, size in sized) <= budget:
+        return [(page, text) for _, page, text, _ in sized]
+
+    terms = set(WORD_RE.findall(question.casefold())) - STOPWORDS
+    ranked = sorted(
+        sized,
+        # Shared words first; earlier chunks win ties (intros, definitions)
+        key=lambda c: (-len(terms & set(WORD_RE.findall(c[2].casefold()))), c[0]),
+    )
+
+    chosen, used = [], 0
+    for chunk in ranked:
+        if used + chunk[3] <= budget:
+            chosen.append(chunk)
+            used += chunk[3]
+    return [(page, text) for _, page, text, _ in sorted(chosen)]
+
+
+def document_context(files, question: str, budget: int = None):
+    """
+    ``(prompt block, files left unread)`` for the PDF, text and (with OCR)
+    image attachments in ``files``. The block is empty if none of them
+    yielded any text.
+    """
+    budget = budget or Config.DOCUMENT_CONTEXT_TOKENS
+    documents, unread = [], []
+    for f in files or []:
+        try:
+            pages = file_pages(f)
+        except (FileProcessingError, OCRError) as e:
+            logger.warning(f"⚠️ {e}")
+            pages = None
+        if pages is None or not any(p.strip() for p in pages):
+            unread.append(f)  # other types, or scanned PDFs with no text layer
+        else:
+            documents.append((f, len(pages), list(chunk_pages(pages, Config.DOCUMENT_CHUNK_TOKENS))))
+
+    if not documents:
+        return "", unread
+
+    # Equal share per document; a short one leaves its unused share behind
+    blocks, remaining = [], budget
+    for i, (f, page_count, chunks) in enumerate(documents):
+        share = remaining // (len(documents) - i)
+        selected = select_chunks(chunks, question, share)
+        remaining -= sum(estimate_tokens(text) + CHUNK_OVERHEAD_TOKENS for _, text in selected)
+
+        total = len(chunks)
+        header = f"📄 {f.get('name', 'document')}"
+        if is_ocr_source(f):
+            header += " (text read from the image by OCR, may contain recognition errors)"
+        if len(selected) < total:
+            header += f" (excerpts: {len(selected)} of {total} sections)"
+        if page_count > 1:
+            body = "\n\n".join(f"[page {page}]\n{text}" for page, text in selected)
+        else:
+            body = "\n\n".join(text for _, text in selected)
+        blocks.append(f"{header}\n{body}")
+
+    context = (
+        "The student attached these documents. Use them to answer.\n\n"
+        + "\n\n".join(blocks)
+        + "\n\n---\n\n"
+    )
+    return context, unread
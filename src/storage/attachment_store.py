@@ -0,0 +1,177 @@
+"""
+Content-addressed attachment store
+
+Uploads are written once to ``Config.UPLOAD_DIR`` under their SHA-256
+(``calculate_file_hash``) and chat messages keep only a small reference:
+
+    {"hash": "...", "name": "notes.png", "type": "image/png", "size": 48213}
+
+Recently used files stay in an in-memory LRU bounded by total bytes. For
+the browser, images are published into Streamlit's static folder so the
+chat HTML can point at a URL instead of inlining base64.
+"""
+import base64
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from src.core.config import Config
+from src.core.exceptions import FileProcessingError
+from src.utils.helpers import calculate_file_hash
+
+# Streamlit's static handler serves only these with their real content type
+STATIC_EXTENSIONS = {
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+    "image/gif": ".gif",
+    "image/webp": ".webp",
+}
+
+STATIC_URL = "app/static"
+
+
+def write_atomic(target: Path, data: bytes):
+    """Write via a temp file + rename, so readers never see a partial file"""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=target.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, target)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+class AttachmentStore:
+    def __init__(self, root: Path, public_dir: Path, max_cache_bytes: int = 64 * 1024 * 1024):
+        self.root = Path(root)
+        self.public_dir = Path(public_dir)
+        self.max_cache_bytes = max_cache_bytes
+
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._cache_bytes = 0
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------
+    # Paths
+    # ------------------------------------------------------
+    def path(self, file_hash: str) -> Path:
+        # Two-level fan-out keeps directories small
+        return self.root / file_hash[:2] / file_hash
+
+    # ------------------------------------------------------
+    # In-memory LRU
+    # ------------------------------------------------------
+    def _remember(self, file_hash: str, data: bytes):
+        if len(data) > self.max_cache_bytes:
+            return
+        with self._lock:
+            old = self._cache.pop(file_hash, None)
+            if old is not None:
+                self._cache_bytes -= len(old)
+            self._cache[file_hash] = data
+            self._cache_bytes += len(data)
+            while self._cache_bytes > self.max_cache_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_bytes -= len(evicted)
+
+    # ------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------
+    def put(self, data: bytes, name: str, mime_type: str) -> dict:
+        """Store bytes (deduplicated by content) and return the message reference"""
+        file_hash = calculate_file_hash(data)
+        target = self.path(file_hash)
+        try:
+            if not target.exists():
+                write_atomic(target, data)
+        except OSError as e:
+            raise FileProcessingError(f"Could not store attachment {name}: {e}") from e
+
+        self._remember(file_hash, data)
+        return {"hash": file_hash, "name": name, "type": mime_type, "size": len(data)}
+
+    def get(self, file_hash: str) -> bytes:
+        with self._lock:
+            data = self._cache.get(file_hash)
+            if data is not None:
+                self._cache.move_to_end(file_hash)
+                return data
+
+        try:
+            data = self.path(file_hash).read_bytes()
+        except OSError as e:
+            raise FileProcessingError(f"Attachment {file_hash[:12]} not found") from e
+
+        self._remember(file_hash, data)
+        return data
+
+    def get_base64(self, file_hash: str) -> str:
+        return base64.b64encode(self.get(file_hash)).decode("utf-8")
+
+    def exists(self, file_hash: str) -> bool:
+        return file_hash in self._cache or self.path(file_hash).exists()
+
+    def publish(self, file_hash: str, mime_type: str) -> Optional[str]:
+        """
+        URL the browser can load the file from (Streamlit static serving),
+        or None if this type can't be served statically.
+        """
+        ext = STATIC_EXTENSIONS.get(mime_type)
+        if ext is None:
+            return None
+
+        public = self.public_dir / f"{file_hash}{ext}"
+        if not public.exists():
+            try:
+                public.parent.mkdir(parents=True, exist_ok=True)
+                try:
+                    os.link(self.path(file_hash), public)  # no extra disk space
+                except OSError:
+                    shutil.copyfile(self.path(file_hash), public)
+            except FileExistsError:
+                pass
+            except OSError:
+                return None
+
+        return self.public_url(public.name)
+
+    def public_url(self, filename: str) -> str:
+        return f"{STATIC_URL}/{self.public_dir.name}/{filename}"
+
+
+def attachment_bytes(file_ref: dict) -> bytes:
+    """Raw bytes of a message attachment (reference or legacy inline base64)"""
+    if file_ref.get("hash"):
+        return get_attachment_store().get(file_ref["hash"])
+    return base64.b64decode(file_ref.get("data", ""))
+
+
+def attachment_base64(file_ref: dict) -> str:
+    """Base64 of a message attachment (reference or legacy inline base64)"""
+    if file_ref.get("hash"):
+        return get_attachment_store().get_base64(file_ref["hash"])
+    return file_ref.get("data", "")
+
+
+_store: Optional[AttachmentStore] = None
+_store_lock = threading.Lock()
+
+
+def get_attachment_store() -> AttachmentStore:
+    """Return the process-wide attachment store"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = AttachmentStore(
+                    Config.UPLOAD_DIR,
+                    Config.STATIC_ATTACHMENTS_DIR,
+                    max_cache_bytes=Config.ATTACHMENT_CACHE_MB * 1024 * 1024,
+                )
+    return _store
@@ -0,0 +1,228 @@
+"""
+Persistent conversations in SQLite (``Config.DATABASE_URL``)
+
+Messages are append-only rows indexed by conversation and position, so a
+resumed session loads only its latest window and pages further back on
+demand. Attachments are stored as references (content hash, name, type,
+size) into the attachment store, never as file data.
+
+Writes take a batch of messages and commit them in one transaction; the
+database runs in WAL mode so reads don't wait on writes.
+"""
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+from src.core.config import Config
+from src.core.exceptions import DatabaseError
+from src.utils.helpers import truncate_text
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    user_id TEXT,
+    title TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id TEXT PRIMARY KEY,
+    conversation_id TEXT NOT NULL REFERENCES conversations (id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    model TEXT,
+    timestamp TEXT
+);
+CREATE TABLE IF NOT EXISTS message_files (
+    message_id TEXT NOT NULL REFERENCES messages (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    file_hash TEXT NOT NULL,
+    name TEXT,
+    type TEXT,
+    size INTEGER,
+    PRIMARY KEY (message_id, position)
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_messages_conversation_seq ON messages (conversation_id, seq);
+CREATE INDEX IF NOT EXISTS idx_messages_conversation_timestamp ON messages (conversation_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_conversations_user_updated ON conversations (user_id, updated_at);
+CREATE INDEX IF NOT EXISTS idx_message_files_hash ON message_files (file_hash);
+"""
+
+
+def sqlite_path(database_url: str) -> Path:
+    """File path of a ``sqlite:///...`` URL"""
+    prefix = "sqlite:///"
+    if not database_url.startswith(prefix):
+        raise DatabaseError(f"Unsupported DATABASE_URL (only sqlite:/// is supported): {database_url}")
+    return Path(database_url[len(prefix):])
+
+
+class ConversationStore:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+        self._lock = threading.Lock()
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            # WAL + NORMAL: a crash can lose the last commits, never corrupt the file
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            self._conn.execute("PRAGMA busy_timeout=5000")
+            self._conn.executescript(SCHEMA)
+            self._conn.commit()
+        except (OSError, sqlite3.Error) as e:
+            raise DatabaseError(f"Could not open conversation store {self.path}: {e}") from e
+
+    # ------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------
+    def append_messages(self, batch):
+        """
+        Persist ``(conversation_id, message, user_id)`` items in one
+        transaction. Messages already stored (same id) are skipped.
+        """
+        now = datetime.now().isoformat()
+        try:
+            with self._lock, self._conn:
+                for conversation_id, message, user_id in batch:
+                    self._conn.execute(
+                        """
+                        INSERT INTO conversations (id, user_id, created_at, updated_at) VALUES (?, ?, ?, ?)
+                        ON CONFLICT (id) DO UPDATE SET updated_at = excluded.updated_at
+                        """,
+                        (conversation_id, user_id, now, now),
+                    )
+                    inserted = self._conn.execute(
+                        """
+                        INSERT OR IGNORE INTO messages (id, conversation_id, seq, role, content, model, timestamp)
+                        SELECT ?, ?, COALESCE(MAX(seq), 0) + 1, ?, ?, ?, ?
+                        FROM messages WHERE conversation_id = ?
+                        """,
+                        (
+                            message["id"], conversation_id, message.get("role", "user"),
+                            message.get("content", ""), message.get("model"), message.get("timestamp"),
+                            conversation_id,
+                        ),
+                    ).rowcount
+                    if not inserted:
+                        continue
+
+                    self._conn.executemany(
+                        "INSERT INTO message_files (message_id, position, file_hash, name, type, size) VALUES (?, ?, ?, ?, ?, ?)",
+                        [
+                            (message["id"], i, f["hash"], f.get("name"), f.get("type"), f.get("size"))
+                            for i, f in enumerate(message.get("files") or [])
+                            if f.get("hash")  # legacy inline data isn't persisted
+                        ],
+                    )
+                    if message.get("role") == "user":
+                        self._conn.execute(
+                            "UPDATE conversations SET title = COALESCE(title, ?) WHERE id = ?",
+                            (truncate_text(message.get("content", ""), 80), conversation_id),
+                        )
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Could not save messages: {e}") from e
+
+    def delete_conversation(self, conversation_id: str):
+        try:
+            with self._lock, self._conn:
+                self._conn.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Could not delete conversation: {e}") from e
+
+    # ------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------
+    def _query(self, sql, params=()):
+        try:
+            with self._lock:
+                return self._conn.execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Conversation store query failed: {e}") from e
+
+    def count_messages(self, conversation_id: str, before_id: Optional[str] = None) -> int:
+        if before_id is None:
+            sql, params = "SELECT COUNT(*) FROM messages WHERE conversation_id = ?", (conversation_id,)
+        else:
+            sql = """
+                SELECT COUNT(*) FROM messages
+                WHERE conversation_id = ? AND seq < (SELECT seq FROM messages WHERE id = ?)
+            """
+            params = (conversation_id, before_id)
+        return self._query(sql, params)[0][0]
+
+    def load_messages(self, conversation_id: str, limit: int, before_id: Optional[str] = None) -> List[dict]:
+        """
+        The latest ``limit`` messages (-1: all), oldest first; with
+        ``before_id``, the ``limit`` messages preceding that one
+        """
+        if before_id is None:
+            where, params = "conversation_id = ?", (conversation_id,)
+        else:
+            where = "conversation_id = ? AND seq < (SELECT seq FROM messages WHERE id = ?)"
+            params = (conversation_id, before_id)
+        rows = self._query(
+            f"""
+            SELECT id, role, content, model, timestamp FROM messages
+            WHERE {where} ORDER BY seq DESC LIMIT ?
+            """,
+            (*params, limit),
+        )
+        if not rows:
+            return []
+
+        files = {}
+        for message_id, file_hash, name, ftype, size in self._query(
+            f"""
+            SELECT message_id, file_hash, name, type, size FROM message_files
+            WHERE message_id IN (
+                SELECT id FROM messages WHERE {where} ORDER BY seq DESC LIMIT ?
+            )
+            ORDER BY message_id, position
+            """,
+            (*params, limit),
+        ):
+            files.setdefault(message_id, []).append(
+                {"hash": file_hash, "name": name, "type": ftype, "size": size}
+            )
+
+        messages = []
+        for message_id, role, content, model, timestamp in reversed(rows):
+            message = {"id": message_id, "role": role, "content": content, "timestamp": timestamp}
+            if model:
+                message["model"] = model
+            if role == "user":
+                message["files"] = files.get(message_id, [])
+            messages.append(message)
+        return messages
+
+    def list_conversations(self, user_id: Optional[str] = None, limit: int = 20) -> List[dict]:
+        rows = self._query(
+            """
+            SELECT id, title, updated_at FROM conversations
+            WHERE user_id IS ? ORDER BY updated_at DESC LIMIT ?
+            """,
+            (user_id, limit),
+        )
+        return [{"id": cid, "title": title, "updated_at": updated} for cid, title, updated in rows]
+
+
+_store: Optional[ConversationStore] = None
+_store_lock = threading.Lock()
+
+
+def get_conversation_store() -> Optional[ConversationStore]:
+    """Return the process-wide conversation store, or None if persistence is off"""
+    global _store
+    if not Config.CHAT_PERSISTENCE_ENABLED:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ConversationStore(sqlite_path(Config.DATABASE_URL))
+    return _store
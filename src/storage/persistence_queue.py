@@ -0,0 +1,196 @@
+"""
+Write-behind persistence for chat messages
+
+The UI thread hands messages to a bounded queue and moves on; one
+background thread drains it and commits whatever has accumulated as a
+single transaction (group commit). A batch is written when it reaches
+``batch_size`` messages or ``flush_interval`` seconds after its first
+message arrived, whichever comes first, and everything left is written on
+shutdown.
+
+``stats()`` reports queue depth and flush latency.
+"""
+import atexit
+import queue
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+from src.core.config import Config
+from src.core.exceptions import DatabaseError
+from src.storage.conversation_store import ConversationStore, get_conversation_store
+from src.utils.logger import setup_logger
+
+logger = setup_logger()
+
+_STOP = object()
+
+
+class WriteBehindQueue:
+    def __init__(
+        self,
+        store: ConversationStore,
+        max_size: int = 1000,
+        batch_size: int = 64,
+        flush_interval: float = 0.5,
+        retries: int = 3,
+    ):
+        self.store = store
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retries = retries
+
+        self._queue = queue.Queue(maxsize=max_size)
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=256)
+        self._stats = {
+            "enqueued": 0,
+            "written": 0,
+            "flushes": 0,
+            "sync_writes": 0,
+            "failed": 0,
+            "max_depth": 0,
+        }
+
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="persistence-writer", daemon=True)
+        self._thread.start()
+
+    # ------------------------------------------------------
+    # Producer side (UI thread)
+    # ------------------------------------------------------
+    def submit(self, conversation_id: str, message: dict, user_id: Optional[str] = None):
+        """Queue a message for saving; only blocks if the queue is full"""
+        item = (conversation_id, dict(message), user_id)
+        if self._closed:
+            self._write([item])
+            return
+
+        try:
+            self._queue.put(item, timeout=1.0)
+        except queue.Full:
+            # Writer can't keep up: save this one here rather than drop it
+            logger.warning("⚠️ Persistence queue full, writing synchronously")
+            with self._lock:
+                self._stats["sync_writes"] += 1
+            self._write([item])
+            return
+
+        with self._lock:
+            self._stats["enqueued"] += 1
+            self._stats["max_depth"] = max(self._stats["max_depth"], self._queue.qsize())
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until everything queued so far is committed (read-your-writes)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self, timeout: float = 10.0):
+        """Write everything still queued and stop the writer thread"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    # ------------------------------------------------------
+    # Writer thread
+    # ------------------------------------------------------
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                self._queue.task_done()
+                return
+
+            batch, stop = [first], False
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._write(batch)
+            for _ in range(len(batch) + stop):
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _write(self, batch):
+        started = time.perf_counter()
+        for attempt in range(1, self.retries + 1):
+            try:
+                self.store.append_messages(batch)
+                break
+            except DatabaseError as e:
+                if attempt == self.retries:
+                    logger.error(f"❌ Lost {len(batch)} chat messages after {attempt} attempts: {e}")
+                    with self._lock:
+                        self._stats["failed"] += len(batch)
+                    return
+                time.sleep(0.1 * 2 ** attempt)  # e.g. database locked by another process
+
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._latencies.append(elapsed)
+            self._stats["written"] += len(batch)
+            self._stats["flushes"] += 1
+
+    # ------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------
+    def stats(self) -> dict:
+        with self._lock:
+            last = self._latencies[-1] if self._latencies else None
+            latencies = sorted(self._latencies)
+            stats = dict(self._stats)
+
+        stats["queue_depth"] = self._queue.qsize()
+        if latencies:
+            stats["flush_latency_ms"] = {
+                "last": round(last * 1000, 2),
+                "avg": round(sum(latencies) / len(latencies) * 1000, 2),
+                "p95": round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 2),
+                "max": round(latencies[-1] * 1000, 2),
+            }
+        if stats["flushes"]:
+            stats["avg_batch"] = round(stats["written"] / stats["flushes"], 1)
+        return stats
+
+
+_queue: Optional[WriteBehindQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_persistence_queue() -> Optional[WriteBehindQueue]:
+    """Return the process-wide write-behind queue, or None if persistence is off"""
+    global _queue
+    if _queue is None:
+        store = get_conversation_store()
+        if store is None:
+            return None
+        with _queue_lock:
+            if _queue is None:
+                _queue = WriteBehindQueue(
+                    store,
+                    max_size=Config.PERSIST_QUEUE_SIZE,
+                    batch_size=Config.PERSIST_BATCH_SIZE,
+                    flush_interval=Config.PERSIST_FLUSH_INTERVAL,
+                )
+                atexit.register(_queue.close)
+    return _queue
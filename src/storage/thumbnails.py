@@ -0,0 +1,141 @@
+"""
+Thumbnails for image attachments
+
+Chat bubbles show a small preview instead of the full photo (phone shots
+are often 3-10 MB). Previews are generated once per content hash, at each
+of ``Config.THUMBNAIL_SIZES`` (longest side, px), on a background pool so
+the upload rerun never waits for Pillow. They are written next to the
+published originals, so the browser loads them by URL.
+
+WEBP is used when this Pillow build supports it, JPEG otherwise.
+"""
+import io
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional
+
+from PIL import Image, ImageOps, features
+
+from src.core.config import Config
+from src.storage.attachment_store import AttachmentStore, get_attachment_store, write_atomic
+from src.utils.logger import setup_logger
+
+logger = setup_logger()
+
+
+class ThumbnailService:
+    def __init__(
+        self,
+        store: AttachmentStore,
+        sizes=(320, 640),
+        quality: int = 80,
+        max_workers: int = 2,
+    ):
+        self.store = store
+        self.out_dir = store.public_dir
+        self.sizes = tuple(sorted(sizes))
+
+        if features.check("webp"):
+            self.format, self.ext = "WEBP", ".webp"
+            self.save_options = {"quality": quality, "method": 4}
+        else:
+            self.format, self.ext = "JPEG", ".jpg"
+            self.save_options = {"quality": quality, "optimize": True}
+
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="thumbs")
+        self._pending: Dict[str, Future] = {}
+        self._ready = set()
+        self._failed = set()
+        self._lock = threading.Lock()
+
+    def path(self, file_hash: str, size: int) -> Path:
+        return self.out_dir / f"{file_hash}_{size}{self.ext}"
+
+    # ------------------------------------------------------
+    # State
+    # ------------------------------------------------------
+    def ready(self, file_hash: str) -> bool:
+        if file_hash in self._ready:
+            return True
+        if all(self.path(file_hash, size).exists() for size in self.sizes):
+            # Generated by an earlier process
+            self._ready.add(file_hash)
+            return True
+        return False
+
+    def failed(self, file_hash: str) -> bool:
+        return file_hash in self._failed
+
+    # ------------------------------------------------------
+    # Generation
+    # ------------------------------------------------------
+    def schedule(self, file_hash: str) -> Optional[Future]:
+        """Queue thumbnail generation (no-op if done, failed or already queued)"""
+        if self.ready(file_hash) or file_hash in self._failed:
+            return None
+        with self._lock:
+            future = self._pending.get(file_hash)
+            if future is None:
+                future = self._pool.submit(self._generate, file_hash)
+                self._pending[file_hash] = future
+        return future
+
+    def _generate(self, file_hash: str):
+        try:
+            with Image.open(io.BytesIO(self.store.get(file_hash))) as img:
+                img = ImageOps.exif_transpose(img)  # phones store rotation in EXIF
+                if self.format == "JPEG":
+                    img = img.convert("RGB")
+                elif img.mode not in ("RGB", "RGBA"):
+                    img = img.convert("RGBA")
+
+                self.out_dir.mkdir(parents=True, exist_ok=True)
+                # Largest first; each smaller size is resampled from the previous one
+                for size in reversed(self.sizes):
+                    img.thumbnail((size, size), Image.LANCZOS)
+                    buffer = io.BytesIO()
+                    img.save(buffer, self.format, **self.save_options)
+                    write_atomic(self.path(file_hash, size), buffer.getvalue())
+
+            self._ready.add(file_hash)
+        except Exception as e:
+            logger.warning(f"⚠️ Thumbnail failed for {file_hash[:12]}: {e}")
+            self._failed.add(file_hash)
+        finally:
+            with self._lock:
+                self._pending.pop(file_hash, None)
+
+    # ------------------------------------------------------
+    # URLs
+    # ------------------------------------------------------
+    def srcset(self, file_hash: str) -> Optional[str]:
+        """``srcset`` for the chat bubble (smallest size at 1x), or None if not ready"""
+        if not self.ready(file_hash):
+            return None
+        return ", ".join(
+            f"{self.store.public_url(self.path(file_hash, size).name)} {i + 1}x"
+            for i, size in enumerate(self.sizes)
+        )
+
+    def read(self, file_hash: str, size: int) -> bytes:
+        return self.path(file_hash, size).read_bytes()
+
+
+_service: Optional[ThumbnailService] = None
+_service_lock = threading.Lock()
+
+
+def get_thumbnail_service() -> ThumbnailService:
+    """Return the process-wide thumbnail service"""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = ThumbnailService(
+                    get_attachment_store(),
+                    sizes=Config.THUMBNAIL_SIZES,
+                    quality=Config.THUMBNAIL_QUALITY,
+                    max_workers=Config.THUMBNAIL_WORKERS,
+                )
+    return _service
@@ -0,0 +1,244 @@
+"""
+HTML sanitizing for chat text
+
+Three sanitizers share one engine:
+
+- ``sanitize_content``: messages as they are stored (user questions and
+  AI replies). Drops script / iframe / object / embed / style elements,
+  ``class`` / ``style`` attributes and the chat bubbles' own class names,
+  and tidies whitespace.
+- ``sanitize_for_render``: the last check before a message is rendered
+  (script / style / iframe elements and their escaped openers).
+- ``strip_all_html``: plain text, for replies that must not carry markup.
+
+Each string is scanned once, left to right, with one precompiled
+alternation; text between matches is copied as it is. Closing tags are
+found with a literal search that never covers the same span twice, so
+the work stays linear in the input. The regex cascade this replaces
+rescanned the rest of the string for every unclosed ``<script`` or ``<``
+(see ``benchmarks/bench_sanitizer.py``).
+"""
+import html
+import re
+from typing import Iterable
+
+# Three or more newlines in a whitespace run (first to last newline)
+_BLANK_LINES_RE = re.compile(r"\n(?:[^\S\n]*\n){2,}")
+_SPACES_RE = re.compile(r" {2,}")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Class names of the chat bubbles (ui/components/chat_interface.py)
+UI_CLASS_NAMES = ("bubble", "message", "timestamp", "meta", "wrapper")
+
+
+# Marks where a UI class attribute was removed: whitespace on both sides
+# is joined at the end, but doesn't count as preceding a later attribute
+# (attributes after whitespace go first, UI classes after them)
+_SEAM = object()
+
+
+def _ends_with_space(out) -> bool:
+    for piece in reversed(out):
+        if piece is _SEAM:
+            return False
+        if piece:
+            return piece[-1].isspace()
+    return False
+
+
+def _pop_trailing_space(out) -> str:
+    """Remove the whitespace at the end of ``out`` and return it"""
+    trailing = []
+    while out and out[-1] is not _SEAM:
+        piece = out.pop()
+        stripped = piece.rstrip()
+        trailing.append(piece[len(stripped):])
+        if stripped:
+            out.append(stripped)
+            break
+    return "".join(reversed(trailing))
+
+
+class Sanitizer:
+    """
+    Removes ``block_tags`` elements (opening tag through closing tag) in a
+    single pass.
+
+    Args:
+        block_tags: Elements to remove with their content
+        drop_open_tags: Also remove an opening tag that is never closed
+        escaped_tags: Remove ``&lt;tag`` (escaped openers) too
+        strip_attributes: Remove ``class`` / ``style`` attributes that
+            follow whitespace, and ``class=`` naming a UI class
+        collapse_spaces: Collapse runs of spaces to one
+    """
+
+    def __init__(
+        self,
+        block_tags: Iterable[str],
+        drop_open_tags: bool = False,
+        escaped_tags: Iterable[str] = (),
+        strip_attributes: bool = False,
+        collapse_spaces: bool = False,
+    ):
+        self.block_tags = tuple(block_tags)
+        self.drop_open_tags = drop_open_tags
+        self.collapse_spaces = collapse_spaces
+
+        # Every alternative starts with a plain character (set), which lets
+        # the regex engine skip straight to candidate positions. At the same
+        # position the first alternative wins.
+        alternatives = []
+        if strip_attributes:
+            alternatives.append(
+                r"[cCsS](?P<attr>(?:(?<=[cC])(?i:lass)|(?<=[sS])(?i:tyle))"
+                r"""(?P<eq>\s*=\s*)["'](?P<value>[^"']*)["'])"""
+            )
+        # By prefix, like the regexes this replaced: "<scripty>" is removed too
+        alternatives.append(rf"<(?P<tag>(?i:{'|'.join(self.block_tags)}))")
+        escaped_tags = tuple(escaped_tags)
+        if escaped_tags:
+            alternatives.append(rf"&(?P<escaped>(?i:lt;(?:{'|'.join(escaped_tags)})))")
+        alternatives.append(r"\n(?P<blank>(?:[^\S\n]*\n){2,})")
+        if collapse_spaces:
+            alternatives.append(r" (?P<spaces> +)")
+
+        self._token_re = re.compile("|".join(alternatives))
+        self._close_re = {tag: re.compile(rf"</{tag}>", re.IGNORECASE) for tag in self.block_tags}
+
+    def _normalize_space(self, run: str) -> str:
+        run = _BLANK_LINES_RE.sub("\n\n", run)
+        if self.collapse_spaces:
+            run = _SPACES_RE.sub(" ", run)
+        return run
+
+    def _join_space(self, text: str, pos: int, out) -> int:
+        """
+        After a removal: whitespace on both sides becomes one run, tidied
+        like any other. Returns the position after the whitespace taken.
+        """
+        lead = _WHITESPACE_RE.match(text, pos)
+        if lead is None or not _ends_with_space(out):
+            return pos
+        out.append(self._normalize_space(_pop_trailing_space(out) + lead.group()))
+        return lead.end()
+
+    def _join_seams(self, out) -> str:
+        joined = []
+        for piece in out:
+            if piece is _SEAM:
+                continue
+            stripped = piece.lstrip()
+            if len(stripped) < len(piece) and _ends_with_space(joined):
+                lead = piece[:len(piece) - len(stripped)]
+                piece = self._normalize_space(_pop_trailing_space(joined) + lead) + stripped
+            joined.append(piece)
+        return "".join(joined)
+
+    def __call__(self, text) -> str:
+        if not text:
+            return ""
+        text = str(text)
+
+        out, pos, seams = [], 0, False
+        gt = -1           # next ">" at or after pos (-1: look it up)
+        no_gt = False     # no ">" left: no opening tag can complete
+        unclosed = set()  # tags never closed after this point
+        search = self._token_re.search
+
+        while True:
+            match = search(text, pos)
+            if match is None:
+                break
+            start, kind = match.start(), match.lastgroup
+            if start > pos:
+                out.append(text[pos:start])
+            pos = match.end()
+
+            if kind == "blank":
+                out.append("\n\n")
+            elif kind == "spaces":
+                out.append(" ")
+            elif kind == "escaped":
+                pos = self._join_space(text, pos, out)
+            elif kind == "attr":
+                name = text[start:match.start("eq")]
+                eq, value = match.group("eq", "value")
+                if name in ("class", "style") and _ends_with_space(out):
+                    _pop_trailing_space(out)  # removed along with the attribute
+                elif name.lower() == "class" and eq == "=" and any(c in value.casefold() for c in UI_CLASS_NAMES):
+                    out.append(_SEAM)
+                    seams = True
+                else:
+                    # Not removed: keep the name and scan its value too
+                    pos = start + len(name)
+                    out.append(name)
+            else:
+                tag = match.group("tag").lower()
+                if gt < pos and not no_gt:
+                    gt = text.find(">", pos)
+                    no_gt = gt == -1
+                if no_gt:
+                    out.append(match.group())
+                    continue
+
+                end = None
+                if tag not in unclosed:
+                    close = self._close_re[tag].search(text, gt + 1)
+                    if close is None:
+                        unclosed.add(tag)
+                    else:
+                        end = close.end()
+                if end is None and self.drop_open_tags:
+                    end = gt + 1
+                if end is None:
+                    out.append(match.group())
+                    continue
+                pos = self._join_space(text, end, out)
+
+        out.append(text[pos:])
+        return (self._join_seams(out) if seams else "".join(out)).strip()
+
+
+_content_sanitizer = Sanitizer(
+    block_tags=("script", "iframe", "object", "embed", "style"),
+    drop_open_tags=True,
+    strip_attributes=True,
+    collapse_spaces=True,
+)
+
+_render_sanitizer = Sanitizer(
+    block_tags=("script", "style", "iframe"),
+    escaped_tags=("script", "style", "iframe"),
+)
+
+
+def sanitize_content(text) -> str:
+    """Sanitize content while preserving valid formatting"""
+    return _content_sanitizer(text)
+
+
+def sanitize_for_render(text) -> str:
+    """Remove scripts, styles and iframes (also escaped) before rendering"""
+    return _render_sanitizer(text)
+
+
+def strip_all_html(text) -> str:
+    """Plain text: tags removed, entities decoded, whitespace collapsed"""
+    if not text:
+        return ""
+    text = str(text)
+
+    out, pos = [], 0
+    while True:
+        lt = text.find("<", pos)
+        if lt == -1:
+            break
+        gt = text.find(">", lt + 1)
+        if gt == -1:
+            break  # nothing after this can be a tag
+        out.append(text[pos:lt])
+        pos = gt + 1
+    out.append(text[pos:])
+
+    return " ".join(html.unescape("".join(out)).split())
@@ -0,0 +1,24 @@
+"""
+Shared test setup: provider calls go to a local fake server
+(``benchmarks/fake_provider.py``), never to Groq or Hugging Face
+"""
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+# Config reads these at import time: no caches or client-side quota, so
+# every call reaches the fake server, and short retry backoff
+for name, value in {
+    "GROQ_API_KEY": "test",
+    "HF_TOKEN": "test",
+    "RESPONSE_CACHE_ENABLED": "false",
+    "SEMANTIC_CACHE_ENABLED": "false",
+    "RATE_LIMIT_ENABLED": "false",
+    "CHAT_PERSISTENCE_ENABLED": "false",
+    "RETRY_BASE_DELAY": "0.05",
+    "RETRY_MAX_DELAY": "0.5",
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,120 @@
+"""
+AIManager / AsyncAIManager against the fake provider
+"""
+import base64
+import io
+
+import pytest
+from PIL import Image
+
+from benchmarks.fake_provider import PROFILES, FakeProvider, Profile
+from src.models import circuit_breaker
+from src.models.ai_manager import AIManager
+from src.models.async_ai_manager import AsyncAIManager
+from src.models.hedging import Hedger
+from src.utils.sanitizer import strip_all_html
+
+QUESTION = "How do I solve x^2 + 3x - 4 = 0?"
+EXPECTED = strip_all_html(PROFILES["fast"].reply)
+
+
+@pytest.fixture
+def providers():
+    """(primary URL, fallback URL): a slow Groq and a fast HF"""
+    groq, hf = FakeProvider(Profile(latency_ms=300)), FakeProvider(PROFILES["fast"])
+    yield groq.start(), hf.start()
+    groq.stop()
+    hf.stop()
+
+
+def _hedging_manager(manager_class, urls, hedge_delay):
+    manager = manager_class(hedging=True)
+    manager.groq_url, manager.hf_url = urls
+    # Private hedger: fixed delay, stats of this test only
+    manager.hedger = Hedger(default_delay=hedge_delay, min_samples=10**6)
+    return manager
+
+
+@pytest.mark.parametrize("manager_class", [AIManager, AsyncAIManager])
+def test_hedged_generate_response_primary_wins(manager_class, providers):
+    manager = _hedging_manager(manager_class, providers, hedge_delay=5.0)
+
+    assert manager.generate_response(QUESTION, "llama-3.1-8b-instant") == EXPECTED
+    assert manager.served_model == "llama-3.1-8b-instant"
+    assert manager.hedger.stats()["hedged"] == 0
+
+
+@pytest.mark.parametrize("manager_class", [AIManager, AsyncAIManager])
+def test_hedged_generate_response_hedge_wins(manager_class, providers):
+    manager = _hedging_manager(manager_class, providers, hedge_delay=0.05)
+
+    assert manager.generate_response(QUESTION, "llama-3.1-8b-instant") == EXPECTED
+    assert manager.served_model == "phi-3-mini"
+    stats = manager.hedger.stats()
+    assert stats["hedged"] == 1 and stats["hedge_wins"] == 1
+
+
+@pytest.mark.parametrize("manager_class", [AIManager, AsyncAIManager])
+def test_hedged_generate_response_stream(manager_class, providers):
+    manager = _hedging_manager(manager_class, providers, hedge_delay=0.05)
+
+    reply = "".join(manager.generate_response_stream(QUESTION, "llama-3.1-8b-instant"))
+    assert reply == EXPECTED
+
+
+@pytest.fixture
+def breakers(monkeypatch):
+    """Fresh process-wide circuit breakers for one test"""
+    monkeypatch.setattr(circuit_breaker, "_breakers", {})
+    return circuit_breaker
+
+
+def test_vision_outage_leaves_hf_text_available(breakers):
+    with FakeProvider(PROFILES["fast"]) as url:
+        manager = AIManager()
+        manager.groq_url = manager.hf_url = url
+        vision = breakers.breaker_for(manager._hf_vision_request(QUESTION, []))
+        assert vision is not breakers.breaker_for(manager._hf_text_request(QUESTION))
+        for _ in range(vision.failure_threshold):
+            vision.record_failure()
+
+        assert manager.generate_response(QUESTION, "phi-3-mini") == EXPECTED
+        assert manager.served_model == "phi-3-mini"
+
+
+@pytest.mark.parametrize("manager_class", [AIManager, AsyncAIManager])
+def test_hedged_request_skips_a_refusing_primary(manager_class, breakers, monkeypatch):
+    groq, hf = FakeProvider(PROFILES["fast"]), FakeProvider(PROFILES["fast"])
+    manager = _hedging_manager(manager_class, (groq.start(), hf.start()), hedge_delay=5.0)
+    primary = breakers.get_circuit_breaker("groq:llama-3.1-8b-instant")
+    monkeypatch.setattr(primary, "allow_request", lambda: False)  # opened after _send checked it
+    try:
+        assert manager.generate_response(QUESTION, "llama-3.1-8b-instant") == EXPECTED
+        assert manager.served_model == "phi-3-mini"
+        assert groq.stats()["requests"] == 0
+        assert manager.hedger.stats()["hedged"] == 0
+    finally:
+        groq.stop()
+        hf.stop()
+
+
+def _image_file(color):
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), color).save(buffer, "JPEG")
+    return {"name": "page.jpg", "type": "image/jpeg", "data": base64.b64encode(buffer.getvalue()).decode("utf-8")}
+
+
+@pytest.mark.parametrize("manager_class", [AIManager, AsyncAIManager])
+@pytest.mark.parametrize("stream", [False, True])
+def test_split_vision_answer_keeps_headings(manager_class, stream):
+    """Six images go as two batches; each answer is stripped on its own"""
+    files = [_image_file((40 * i, 0, 0)) for i in range(6)]
+    with FakeProvider(PROFILES["fast"]) as url:
+        manager = manager_class()
+        manager.groq_url = manager.hf_url = url
+        if stream:
+            reply = "".join(manager.generate_response_stream(QUESTION, "hf-vision", files=files))
+        else:
+            reply = manager.generate_response(QUESTION, "hf-vision", files=files)
+
+    assert reply == f"**Images 1-4 of 6**\n\n{EXPECTED}\n\n---\n\n**Images 5-6 of 6**\n\n{EXPECTED}"
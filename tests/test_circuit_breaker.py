@@ -0,0 +1,48 @@
+"""
+CircuitBreaker state transitions
+"""
+import time
+
+from src.models.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+def _open_breaker(recovery_timeout=0.05):
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=recovery_timeout)
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    return breaker
+
+
+def test_half_open_probe_success_closes():
+    breaker = _open_breaker()
+    time.sleep(0.06)
+
+    assert breaker.allow_request()
+    assert not breaker.allow_request()  # one probe at a time
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+
+def test_half_open_probe_failure_reopens():
+    breaker = _open_breaker()
+    time.sleep(0.06)
+
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow_request()
+
+
+def test_unreported_probe_is_written_off():
+    """A cancelled probe must not keep the breaker half-open forever"""
+    breaker = _open_breaker()
+    time.sleep(0.06)
+
+    assert breaker.allow_request()  # the probe is cancelled: no success or failure
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow_request()
+
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CLOSED
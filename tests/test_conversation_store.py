@@ -0,0 +1,29 @@
+"""
+ConversationStore failures surface as DatabaseError
+"""
+import pytest
+
+from src.core.exceptions import DatabaseError
+from src.storage.conversation_store import ConversationStore, sqlite_path
+
+
+def test_unwritable_path_raises_database_error(tmp_path):
+    # A file where the data directory should be: mkdir fails (even as root)
+    blocker = tmp_path / "data"
+    blocker.write_text("not a directory")
+
+    with pytest.raises(DatabaseError):
+        ConversationStore(blocker / "conversations" / "chat.db")
+
+
+def test_unsupported_database_url():
+    with pytest.raises(DatabaseError):
+        sqlite_path("postgres://localhost/chat")
+
+
+def test_round_trip(tmp_path):
+    store = ConversationStore(tmp_path / "chat.db")
+    store.append_messages([("c1", {"id": "m1", "role": "user", "content": "hi"}, None)])
+
+    assert store.count_messages("c1") == 1
+    assert store.load_messages("c1", 10)[0]["content"] == "hi"
@@ -0,0 +1,42 @@
+"""
+Single-pass sanitizers against the regex cascade they replaced
+(``benchmarks/bench_sanitizer.py``)
+"""
+import pytest
+
+from benchmarks.bench_sanitizer import (
+    legacy_sanitize_content,
+    legacy_sanitize_for_render,
+    legacy_strip_all_html,
+)
+from src.utils.sanitizer import sanitize_content, sanitize_for_render, strip_all_html
+
+CASES = [
+    "plain answer\n\n\n\nwith   gaps",
+    "before <script>alert(1)</script> after",
+    "a <SCRIPT src=x>\n</script>b",
+    "unclosed <iframe src=x> tail",
+    # Tag names match by prefix, as they did in the regexes
+    "a <scripty>x</script> b",
+    "a <stylex color=red> b",
+    "<iframes src=x></iframe>ok",
+    "&lt;scripty and &lt;STYLE",
+    '<div class="bubble wrapper">x</div>',
+    '<p  style="color:red" class="note">y</p>',
+    "x < 5 and <b>bold</b> &amp; more",
+]
+
+
+@pytest.mark.parametrize("text", CASES)
+def test_matches_legacy(text):
+    assert sanitize_content(text) == legacy_sanitize_content(text)
+    assert sanitize_for_render(text) == legacy_sanitize_for_render(text)
+    assert strip_all_html(text) == legacy_strip_all_html(text)
+
+
+def test_overlapping_elements_are_removed_whole():
+    # The one intended difference: the outer element goes with everything
+    # inside it, which can leave a stray (harmless) closing tag
+    text = "a <iframe><script></iframe></script> b"
+    assert legacy_sanitize_content(text) == "a b"
+    assert sanitize_content(text) == "a </script> b"
@@ -0,0 +1,36 @@
+"""
+SemanticCache hits and the checks that turn near-duplicates away
+"""
+import pytest
+
+from src.models.semantic_cache import SemanticCache
+
+MODEL = "llama-3.1-8b-instant"
+
+
+@pytest.mark.parametrize("cached, asked", [
+    ("convert celsius to fahrenheit", "convert fahrenheit to celsius"),
+    ("binary to decimal", "decimal to binary"),
+    ("pros of python over java", "pros of java over python"),
+    ("is x greater than y", "is y greater than x"),
+])
+def test_reversed_question_misses(cached, asked):
+    cache = SemanticCache()
+    cache.add(MODEL, cached, "answer")
+
+    assert cache.lookup(MODEL, asked) is None
+    assert cache.lookup(MODEL, cached) == "answer"
+
+
+def test_rephrased_question_hits():
+    cache = SemanticCache()
+    cache.add(MODEL, "what is a derivative", "answer")
+
+    assert cache.lookup(MODEL, "explain derivatives") == "answer"
+
+
+def test_different_numbers_miss():
+    cache = SemanticCache()
+    cache.add(MODEL, "derivative of x^2", "2x")
+
+    assert cache.lookup(MODEL, "derivative of x^3") is None
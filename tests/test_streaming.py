@@ -0,0 +1,57 @@
+"""
+HTMLStripStream: streamed deltas join to the same text as strip_all_html
+"""
+import random
+
+import pytest
+
+from src.models.streaming import HTMLStripStream
+from src.utils.sanitizer import strip_all_html
+
+ATOMS = [
+    "a", "b", " ", "\n", "\t", "<", ">", "&", "p", "amp;", "lt;", "#60;", "#x3C;", "nbsp;",
+    "<b>", "</b>", "x<5", "if a[i] < b[i]: ", "&notin;", "&not", "in;",
+]
+
+
+def _stream(text, chunk_sizes, max_tag_hold=256):
+    stripper = HTMLStripStream(max_tag_hold)
+    out, pos = [], 0
+    for size in chunk_sizes:
+        out.append(stripper.feed(text[pos:pos + size]))
+        pos += size
+    out.append(stripper.feed(text[pos:]))
+    out.append(stripper.close())
+    return "".join(out)
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 4, 7])
+def test_unclosed_lt_before_a_tag(size):
+    text = "if a[i] < b[i]: print(a[i])\nreturn <b>done</b>"
+    assert _stream(text, [size] * (len(text) // size)) == strip_all_html(text) == "if a[i] done"
+
+
+@pytest.mark.parametrize("text", [
+    "<p>Fish &amp; chips</p>",
+    "&am<b>p; split by a tag",
+    "x &notin; A, &#60;tag&#x3E;",
+    "  leading\n\n and   trailing  ",
+    "x < 5 and y > 2",
+])
+def test_matches_strip_all_html(text):
+    for size in range(1, len(text) + 1):
+        assert _stream(text, [size] * (len(text) // size)) == strip_all_html(text)
+
+
+def test_random_chunking_matches_strip_all_html():
+    rng = random.Random(0)
+    for _ in range(2000):
+        text = "".join(rng.choice(ATOMS) for _ in range(rng.randint(0, 40)))
+        chunks = [rng.randint(1, 8) for _ in range(len(text))]
+        assert _stream(text, chunks) == strip_all_html(text), text
+
+
+def test_old_unclosed_lt_is_released():
+    text = "x < 5, " + "y" * 40
+    assert _stream(text, [1] * len(text), max_tag_hold=16) == text
+    assert HTMLStripStream(max_tag_hold=16).feed(text) == text
@@ -12,17 +12,25 @@ print("EXPECTS src AT:", ROOT_DIR / "src")
 import src.load_env
 
 import streamlit as st
-import base64
 import json
+import uuid
 from datetime import datetime
-import re
 
 # Add project root
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from src.models.ai_manager import AIManager
+from src.models.async_ai_manager import AsyncAIManager
 from ui.components.header import render_header
-from ui.components.chat_interface import render_chat
+from src.core.config import Config
+from src.core.exceptions import DatabaseError
+from src.processors.ocr_processor import ocr_available
+from src.storage.attachment_store import get_attachment_store
+from src.storage.conversation_store import get_conversation_store
+from src.storage.persistence_queue import get_persistence_queue
+from src.storage.thumbnails import get_thumbnail_service
+from ui.components.chat_interface import current_window, render_chat, reset_chat_window
+from src.utils.logger import setup_logger
+from src.utils.sanitizer import sanitize_content
 
 # --------------------------------------------------
 # Page Config (First thing in Streamlit)
@@ -437,44 +445,6 @@ div[data-testid="stFileUploader"] input[type="file"] {
 """
 st.markdown(file_uploader_css, unsafe_allow_html=True)
 
-# --------------------------------------------------
-# Helper Functions
-# --------------------------------------------------
-def encode_file(file):
-    """Encode file to base64"""
-    file.seek(0)
-    return base64.b64encode(file.read()).decode("utf-8")
-
-def sanitize_content(text):
-    """Sanitize content while preserving valid formatting"""
-    if not text:
-        return ""
-    
-    text = str(text)
-    
-    # Remove script tags and their content
-    text = re.sub(r'<script[^>]*>.*?</script>', '', text, flags=re.DOTALL | re.IGNORECASE)
-    
-    # Remove dangerous HTML tags (but allow safe markdown/formatting)
-    dangerous_tags = ['script', 'iframe', 'object', 'embed', 'style']
-    for tag in dangerous_tags:
-        text = re.sub(f'<{tag}[^>]*>.*?</{tag}>', '', text, flags=re.DOTALL | re.IGNORECASE)
-        text = re.sub(f'<{tag}[^>]*>', '', text, flags=re.IGNORECASE)
-    
-    # Remove class and style attributes that could inject UI elements
-    text = re.sub(r'\s+(class|style)\s*=\s*["\'][^"\']*["\']', '', text)
-    
-    # Remove known UI injection class names
-    ui_classes = ['bubble', 'message', 'timestamp', 'meta', 'wrapper']
-    for cls in ui_classes:
-        text = re.sub(f'class=["\'][^"\']*{cls}[^"\']*["\']', '', text, flags=re.IGNORECASE)
-    
-    # Clean excessive whitespace
-    text = re.sub(r'\n\s*\n\s*\n+', '\n\n', text)
-    text = re.sub(r' +', ' ', text)
-    
-    return text.strip()
-
 # --------------------------------------------------
 # Constants
 # --------------------------------------------------
@@ -483,7 +453,7 @@ MAX_FILE_MB = 10
 # --------------------------------------------------
 # Instances
 # --------------------------------------------------
-ai = AIManager()
+ai = AsyncAIManager()
 
 # --------------------------------------------------
 # Session State Initialization
@@ -491,6 +461,7 @@ ai = AIManager()
 def init_session_state():
     """Initialize all session state variables"""
     defaults = {
+        "session_id": uuid.uuid4().hex,
         "messages": [],
         "current_model": "llama-3.1-8b-instant",
         "theme": "dark",
@@ -499,7 +470,9 @@ def init_session_state():
         "input_key": 0,
         "uploader_key": 0,
         "processing_response": False,
-        "files_processed": set()  # Track processed files to avoid duplicates
+        "files_processed": set(),  # Track processed files to avoid duplicates
+        "unloaded_messages": 0,  # Older messages still only in the conversation store
+        "persistence_failed": False  # Database unusable: chat carries on unsaved
     }
     
     for key, value in defaults.items():
@@ -508,6 +481,78 @@ def init_session_state():
 
 init_session_state()
 
+# --------------------------------------------------
+# Conversation Persistence (SQLite, see conversation_store)
+# --------------------------------------------------
+logger = setup_logger()
+
+
+def get_persistence():
+    """
+    ``(store, write-behind queue)``, or ``(None, None)`` when persistence is
+    off or the database can't be opened (logged once per session)
+    """
+    if st.session_state.persistence_failed:
+        return None, None
+    try:
+        return get_conversation_store(), get_persistence_queue()
+    except DatabaseError as e:
+        logger.error(f"❌ Conversation persistence disabled: {e}")
+        st.session_state.persistence_failed = True
+        return None, None
+
+
+def resume_conversation():
+    """Load the latest window of the conversation named in the URL (?c=<id>)"""
+    store, writer = get_persistence()
+    conversation_id = st.query_params.get("c")
+    if store and conversation_id:
+        # Messages from before the reload may still be queued
+        writer.flush(timeout=2.0)
+        try:
+            total = store.count_messages(conversation_id)
+            if total:
+                messages = store.load_messages(conversation_id, Config.CHAT_WINDOW_SIZE or -1)
+                st.session_state.session_id = conversation_id
+                st.session_state.messages = messages
+                st.session_state.unloaded_messages = total - len(messages)
+        except DatabaseError as e:
+            logger.warning(f"⚠️ Could not resume conversation: {e}")
+
+    if store:
+        st.query_params["c"] = st.session_state.session_id
+
+
+def persist_message(message):
+    """Queue a chat message for saving (written in the background)"""
+    _, writer = get_persistence()
+    if writer is not None:
+        writer.submit(st.session_state.session_id, message)
+
+
+def load_earlier_messages():
+    """Fetch older messages from the store once "Load earlier" reaches past the loaded ones"""
+    missing = current_window(Config.CHAT_WINDOW_SIZE) - len(st.session_state.messages)
+    store, _ = get_persistence()
+    if not store or missing <= 0 or not st.session_state.unloaded_messages or not st.session_state.messages:
+        return
+    try:
+        older = store.load_messages(
+            st.session_state.session_id,
+            min(missing, st.session_state.unloaded_messages),
+            before_id=st.session_state.messages[0]["id"],
+        )
+    except DatabaseError as e:
+        logger.warning(f"⚠️ {e}")
+        return
+    st.session_state.messages = older + st.session_state.messages
+    st.session_state.unloaded_messages -= len(older)
+
+
+if "conversation_resumed" not in st.session_state:
+    resume_conversation()
+    st.session_state.conversation_resumed = True
+
 # --------------------------------------------------
 # Clean existing messages on first run
 # --------------------------------------------------
@@ -707,7 +752,12 @@ if not st.session_state.messages:
 # --------------------------------------------------
 # Chat Area
 # --------------------------------------------------
-render_chat(st.session_state.messages)
+load_earlier_messages()
+render_chat(
+    st.session_state.messages,
+    window_size=Config.CHAT_WINDOW_SIZE,
+    unloaded=st.session_state.unloaded_messages,
+)
 
 # --------------------------------------------------
 # Input Bar Container
@@ -741,11 +791,14 @@ st.markdown('<div class="input-container">', unsafe_allow_html=True)
 # --------------------------------------------------
 if st.session_state.files_buffer:
     contains_image = any(f.type.startswith("image") for f in st.session_state.files_buffer)
-    contains_pdf = any(f.type == "application/pdf" for f in st.session_state.files_buffer)
 
-    # Only Qwen2-VL Vision supports file reading
-    if (contains_image or contains_pdf) and st.session_state.current_model != "hf-vision":
-        st.warning("⚠️ This model cannot process files. Please switch to **Qwen2-VL (Vision)**.")
+    # PDFs and text files are read into the prompt for every model; only
+    # Qwen2-VL Vision can see images (text models get their OCR text)
+    if contains_image and st.session_state.current_model != "hf-vision":
+        if Config.OCR_ENABLED and ocr_available():
+            st.info("🔎 This model will read the text in your images (OCR). For diagrams, switch to **Qwen2-VL (Vision)**.")
+        else:
+            st.warning("⚠️ This model cannot see images. Please switch to **Qwen2-VL (Vision)**.")
 
 # --------------------------------------------------
 # Enhanced File Preview (Further polished and Responsive)
@@ -1085,25 +1138,31 @@ if send and not st.session_state.processing_response:
         # Mark as processing to prevent double-send
         st.session_state.processing_response = True
         
-        # Prepare files
-        prepared_files = []
-        for file in st.session_state.files_buffer:
-            prepared_files.append({
-                "name": file.name,
-                "type": file.type, 
-                "data": encode_file(file)
-            })
+        # Prepare files: stored once by content hash, messages keep a reference
+        store = get_attachment_store()
+        prepared_files = [
+            store.put(file.getvalue(), file.name, file.type)
+            for file in st.session_state.files_buffer
+        ]
+        # Chat previews are generated in the background
+        thumbs = get_thumbnail_service()
+        for f in prepared_files:
+            if f["type"].startswith("image/"):
+                thumbs.schedule(f["hash"])
 
         # Sanitize user input
         safe_question = sanitize_content(user_text) if user_text else "[Files uploaded]"
 
         # Save user message
-        st.session_state.messages.append({
+        user_message = {
+            "id": uuid.uuid4().hex,  # render cache key
             "role": "user",
             "content": safe_question,
             "files": prepared_files,
             "timestamp": datetime.now().isoformat()
-        })
+        }
+        st.session_state.messages.append(user_message)
+        persist_message(user_message)
 
         # Clear inputs
         st.session_state.files_buffer = []
@@ -1120,30 +1179,54 @@ if st.session_state.messages and st.session_state.processing_response:
     last = st.session_state.messages[-1]
 
     if last["role"] == "user":
-        with st.spinner("🤔 Thinking..."):
-            try:
-                # Get AI response
-                ai_reply = ai.generate_response(
-                    question=last["content"],
-                    model=st.session_state.current_model,
-                    temperature=0.7,
-                    files=last.get("files", [])
-                )
-                
-                # Sanitize response
-                ai_reply = sanitize_content(ai_reply)
-                
-            except Exception as e:
-                ai_reply = f"❌ AI Error: {str(e)}"
-
-            if ai_reply:
-                # Save AI message
-                st.session_state.messages.append({
-                    "role": "assistant",
-                    "content": ai_reply,
-                    "model": st.session_state.current_model,
-                    "timestamp": datetime.now().isoformat()
-                })
+        # Streamed reply is drawn here until it is saved into the chat history
+        live_reply = st.empty()
+        ai_reply = ""
+
+        stream = ai.generate_response_stream(
+            question=last["content"],
+            model=st.session_state.current_model,
+            temperature=0.7,
+            files=last.get("files", []),
+            session_id=st.session_state.session_id,
+            # Earlier turns; trimmed to the model's context window by the manager
+            history=st.session_state.messages[:-1]
+        )
+
+        try:
+            # Spinner only until the first token arrives
+            with st.spinner("🤔 Thinking..."):
+                ai_reply = next(stream, "")
+
+            for delta in stream:
+                ai_reply += delta
+                live_reply.markdown(ai_reply + "▌")
+
+            # Sanitize response
+            ai_reply = sanitize_content(ai_reply)
+
+        except Exception as e:
+            ai_reply = f"❌ AI Error: {str(e)}"
+
+        finally:
+            # Cancels the generation if Streamlit stopped this run mid-stream
+            # (Clear Chat, page navigation, another rerun)
+            stream.close()
+
+        live_reply.empty()
+
+        if ai_reply:
+            # Save AI message
+            ai_message = {
+                "id": uuid.uuid4().hex,
+                "role": "assistant",
+                "content": ai_reply,
+                # Backend that actually answered (differs after failover)
+                "model": ai.served_model or st.session_state.current_model,
+                "timestamp": datetime.now().isoformat()
+            }
+            st.session_state.messages.append(ai_message)
+            persist_message(ai_message)
 
         # Done processing
         st.session_state.processing_response = False
@@ -1151,7 +1234,15 @@ if st.session_state.messages and st.session_state.processing_response:
 
 # Clear Chat button (moved from sidebar to input area for accessibility)
 if st.button("🧹 Clear Chat", type="secondary", use_container_width=True):
+    ai.cancel(st.session_state.session_id)
+    st.session_state.processing_response = False
     st.session_state.messages = []
+    # The cleared conversation stays saved; continue in a new one
+    st.session_state.session_id = uuid.uuid4().hex
+    st.session_state.unloaded_messages = 0
+    if get_persistence()[0]:
+        st.query_params["c"] = st.session_state.session_id
+    reset_chat_window()
     st.session_state.files_buffer = []
     st.session_state.files_processed = set()
     st.session_state.input_key += 1
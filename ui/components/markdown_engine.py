@@ -0,0 +1,177 @@
+"""
+Markdown + syntax highlighting engine for chat messages
+
+Everything that is expensive to build is built once and reused:
+
+- one ``markdown.Markdown`` per thread (Streamlit runs sessions on
+  separate threads), ``reset()`` between documents
+- pygments lexers cached by language name
+- a single shared ``HtmlFormatter`` emitting CSS classes; the matching
+  stylesheet (``stylesheet()``) goes on the page once instead of an
+  inline ``style`` on every token
+
+Fences without a (known) language go through a cheap keyword heuristic
+instead of ``guess_lexer``, which tries every lexer pygments ships and
+gets very slow on long code.
+"""
+import html
+import re
+import threading
+import uuid
+from functools import lru_cache
+from typing import Optional
+
+import markdown
+from pygments import highlight
+from pygments.formatters import HtmlFormatter
+from pygments.lexers import get_lexer_by_name
+from pygments.token import Token
+from pygments.util import ClassNotFound
+
+CODE_FENCE_RE = re.compile(r"```([\w+-]*)\n([\s\S]*?)```")
+
+# (language, pattern) checked in order; first match wins
+LANGUAGE_HINTS = [
+    ("latex", re.compile(r"\\(begin|frac|sum|int|documentclass)\b")),
+    ("html", re.compile(r"<(!DOCTYPE|html|head|body|div|span|p|a)\b", re.IGNORECASE)),
+    ("cpp", re.compile(r"#include\s*<|std::|cout\s*<<")),
+    ("java", re.compile(r"\bpublic\s+(static\s+)?(class|void)\b|System\.out\.")),
+    ("sql", re.compile(r"\b(SELECT|INSERT\s+INTO|UPDATE|CREATE\s+TABLE)\b[\s\S]*?\b(FROM|VALUES|SET|\()", re.IGNORECASE)),
+    ("javascript", re.compile(r"\b(const|let|function)\s+\w+|=>|console\.log")),
+    ("bash", re.compile(r"^(#!\s*/bin/(ba)?sh|\$ |sudo |pip install |cd |ls\b)", re.MULTILINE)),
+    ("json", re.compile(r"^\s*[\[{]\s*\"[^\"]*\"\s*:", re.MULTILINE)),
+    ("python", re.compile(r"^\s*(def |class |import |from \w+ import |print\()", re.MULTILINE)),
+]
+
+
+def guess_language(code: str) -> Optional[str]:
+    """Cheap language hint from well-known keywords, or None"""
+    sample = code[:2000]
+    for language, pattern in LANGUAGE_HINTS:
+        if pattern.search(sample):
+            return language
+    return None
+
+
+@lru_cache(maxsize=64)
+def get_lexer(language: str):
+    """Cached pygments lexer for a language name, or None if unknown"""
+    try:
+        return get_lexer_by_name(language, stripall=True)
+    except ClassNotFound:
+        return None
+
+
+class CompactHtmlFormatter(HtmlFormatter):
+    """
+    Class-based ``HtmlFormatter`` that leaves tokens drawn in the plain
+    text style (names and punctuation, in monokai) without a ``<span>``.
+    Those are the most common tokens, so this removes most of the markup.
+    """
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        base = self.style.style_for_token(Token)
+        self._plain = {ttype for ttype, style in self.style if style == base}
+
+    def _get_css_classes(self, ttype):
+        if ttype in self._plain:
+            return ""
+        return super()._get_css_classes(ttype)
+
+
+class MarkdownEngine:
+    """Renders chat markdown with highlighted code blocks"""
+
+    def __init__(self, style: str = "monokai", inline_styles: bool = False):
+        if inline_styles:
+            self.formatter = HtmlFormatter(style=style, noclasses=True, cssclass="highlight")
+        else:
+            self.formatter = CompactHtmlFormatter(style=style, cssclass="highlight")
+        self._local = threading.local()
+        self._stylesheet = None
+
+    def _markdown(self) -> markdown.Markdown:
+        md = getattr(self._local, "md", None)
+        if md is None:
+            md = self._local.md = markdown.Markdown(
+                extensions=["extra", "codehilite"],
+                # Indented code blocks share the fenced blocks' stylesheet
+                extension_configs={"codehilite": {"guess_lang": False, "css_class": "highlight"}},
+            )
+        return md
+
+    def stylesheet(self) -> str:
+        """CSS for the highlighted code (one copy per page)"""
+        if self._stylesheet is None:
+            # Token and background rules only, scoped to .highlight (the
+            # default defs also restyle every <pre> on the page)
+            self._stylesheet = "\n".join([
+                ".highlight pre { line-height: 125%; }",
+                *self.formatter.get_background_style_defs(".highlight"),
+                *self.formatter.get_token_style_defs(".highlight"),
+            ])
+        return self._stylesheet
+
+    def _lexer_for(self, lang: str, code: str):
+        """(label, lexer) for a fenced block"""
+        if lang:
+            lexer = get_lexer(lang)
+            if lexer is not None:
+                return lang, lexer
+            hint = guess_language(code) or "text"
+        else:
+            # Unlabelled fences have always been shown as Python
+            hint = guess_language(code) or "python"
+
+        return lang or hint, get_lexer(hint)
+
+    def highlight_code(self, code: str, lang: str = "") -> str:
+        label, lexer = self._lexer_for(lang, code)
+        if lexer is None:
+            return f'<pre><code>{html.escape(code)}</code></pre>'
+
+        highlighted = highlight(code, lexer, self.formatter)
+        return f'<div class="code-block-wrapper"><div class="code-header"><span class="code-lang">{label}</span><button class="copy-btn" onclick="copyCode(this)">Copy</button></div>{highlighted}</div>'
+
+    def render(self, text: str) -> str:
+        # Highlight code blocks first and swap them for placeholders, so
+        # markdown doesn't re-scan the (large) highlighted HTML
+        blocks = []
+        nonce = uuid.uuid4().hex
+
+        def stash(match):
+            blocks.append(self.highlight_code(match.group(2), match.group(1)))
+            token = f"CODEBLOCK{nonce}X{len(blocks) - 1}X"
+            # A fence at the start of a line was a block of raw HTML before;
+            # keep it out of the surrounding paragraph
+            if match.start() == 0 or match.string[match.start() - 1] == "\n":
+                return f"\n\n{token}\n\n"
+            return token
+
+        text = CODE_FENCE_RE.sub(stash, text)
+
+        md = self._markdown()
+        try:
+            rendered = md.convert(text)
+        finally:
+            md.reset()
+
+        for i, block in enumerate(blocks):
+            token = f"CODEBLOCK{nonce}X{i}X"
+            rendered = rendered.replace(f"<p>{token}</p>", block).replace(token, block)
+        return rendered
+
+
+_engine: Optional[MarkdownEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_markdown_engine() -> MarkdownEngine:
+    """Return the process-wide markdown engine"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = MarkdownEngine()
+    return _engine